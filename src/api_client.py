@@ -1,26 +1,128 @@
 import os
 import base64
 import json
+import functools
+import hashlib
+import threading
 import requests
 import re
+from collections import OrderedDict
+from requests.adapters import HTTPAdapter
 from loguru import logger
 from typing import Dict, Any, Optional, Tuple, List
 from dotenv import load_dotenv
 
+# Prefer orjson for (de)serializing large API payloads when it is installed
+try:
+    import orjson
+
+    def _json_loads(raw: bytes) -> Any:
+        return orjson.loads(raw)
+
+    def _json_dumps_bytes(obj: Any) -> bytes:
+        return orjson.dumps(obj)
+
+    def _json_dumps_pretty(obj: Any) -> str:
+        return orjson.dumps(obj, default=str, option=orjson.OPT_INDENT_2).decode('utf-8')
+except ImportError:
+    def _json_loads(raw: bytes) -> Any:
+        return json.loads(raw)
+
+    def _json_dumps_bytes(obj: Any) -> bytes:
+        return json.dumps(obj).encode('utf-8')
+
+    def _json_dumps_pretty(obj: Any) -> str:
+        return json.dumps(obj, indent=2, default=str)
+
+# Load environment variables once at import and freeze the settings derived from them
+load_dotenv()
+
+def _envbool(name: str, default: str = 'true') -> bool:
+    """Read a boolean flag from the environment."""
+    return os.getenv(name, default).lower() == 'true'
+
+_GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+_GEMINI_MODEL = os.getenv('GEMINI_MODEL', 'gemini-2.0-flash-exp')
+_GEMINI_FALLBACK_MODEL = os.getenv('GEMINI_FALLBACK_MODEL', 'gemini-2.0-flash-exp-image-generation')
+_DEBUG_ENABLE_PROMPT = _envbool('DEBUG_ENABLE_PROMPT')
+_DEBUG_ENABLE_RESPONSE = _envbool('DEBUG_ENABLE_RESPONSE')
+_DEBUG_VERBOSE_LEVEL = int(os.getenv('DEBUG_VERBOSE_LEVEL', '2'))
+_GEMINI_CACHE = os.getenv('GEMINI_CACHE', '0').lower() in ('1', 'true')
+_GEMINI_CACHE_SIZE = 128
+
+# Patterns used when analysing prompts for debug logging
+_CHAR_COUNT_RE = re.compile(r"TOTAL CHARACTERS: EXACTLY (\d+)")
+_CHAR_NAMES_RE = re.compile(r"Character: ([^\|]+)")
+_ANTI_DUP_RE = re.compile(r"ANTI-DUPLICATION INSTRUCTIONS.*?(?=ART STYLE|\Z)", re.DOTALL)
+
+# Needles and states for the single-pass story text extraction
+_STORY_TEXT_MARKER = "text:"
+_STORY_STOP_MARKERS = ("illustration:", "image prompt:", "visual description:", "scene description:")
+_QUOTED_SKIP_PREFIXES = ("scene:", "character:", "setting:")
+_HEADING_PREFIXES = ('#', '**', '-')
+_STORY_LOOKING, _STORY_COLLECTING, _STORY_DONE = range(3)
+
+# Translation table that deletes markdown formatting characters in a single pass
+_MD_STRIP_TABLE = str.maketrans('', '', '*#`')
+
+# Generation settings for every image request (the request bodies only read it)
+_IMAGE_GENERATION_CONFIG = {
+    "temperature": 0.4, # TODO: Consider making these configurable
+    "top_p": 1,
+    "top_k": 32,
+    "responseModalities": ["Text", "Image"] # Expect both back
+}
+
+# Request part sent between the reference override rules and the reference image itself
+_REFERENCE_CONSISTENCY_PART = {"text": "\n**CRITICAL CONSISTENCY NOTE:** Use the text-based \"CHARACTER INSTRUCTIONS\" (especially rules marked with \"ALWAYS\") as the PRIMARY source for character appearance details (features, clothing, colors). Use the reference image below MAINLY for overall style, color palette, character placement, and general visual guidance. If the reference image contradicts a specific \"ALWAYS\" rule in the text, FOLLOW THE TEXT RULE."}
+
+class RateLimitError(Exception):
+    """Raised when the API answers 429 after the session's own retries are exhausted."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        # Seconds the server asked us to wait (from the Retry-After header), if any
+        self.retry_after = retry_after
+
+class ServerError(Exception):
+    """Raised when the API answers with a 5xx status, which usually clears up on its own."""
+
+# Errors worth retrying at the page level; everything else is treated as permanent
+TRANSIENT_ERRORS = (RateLimitError, ServerError, TimeoutError, ConnectionError)
+
+@functools.lru_cache(maxsize=32)
+def _build_generation_config(temperature: float, seed: Optional[int], top_p: float, top_k: int, max_tokens: int) -> Tuple[Tuple[str, Any], ...]:
+    """Build the scalar generation config entries, cached as an immutable tuple of pairs."""
+    items = [
+        ("temperature", temperature),
+        ("topP", top_p),
+        ("topK", top_k),
+        ("maxOutputTokens", max_tokens),
+    ]
+    if seed is not None:
+        items.append(("seed", seed))
+    return tuple(items)
+
 class APIClient:
     def __init__(self, generation_settings: Dict[str, Any]):
         """Initialize the API client with generation-specific configuration."""
-        # Load environment variables
-        load_dotenv()
+        # Model configuration from environment variables (read once at import)
+        self.model = _GEMINI_MODEL
+        self.fallback_model = _GEMINI_FALLBACK_MODEL
         
-        # Load model configuration from environment variables
-        self.model = os.getenv('GEMINI_MODEL', 'gemini-2.0-flash-exp')
-        self.fallback_model = os.getenv('GEMINI_FALLBACK_MODEL', 'gemini-2.0-flash-exp-image-generation')
+        # Different models support different responseModalities; resolve this once per model
+        model_name = self.model.lower()
+        self._supports_image_modalities = "gemini" in model_name and ("image-generation" in model_name or "-flash-exp" in model_name or "-1.5" in model_name)
         
-        # Load debug settings from environment variables
-        self.debug_enable_prompt = os.getenv('DEBUG_ENABLE_PROMPT', 'true').lower() == 'true'
-        self.debug_enable_response = os.getenv('DEBUG_ENABLE_RESPONSE', 'true').lower() == 'true'
-        self.debug_verbose_level = int(os.getenv('DEBUG_VERBOSE_LEVEL', '2'))
+        # Debug settings from environment variables
+        self.debug_enable_prompt = _DEBUG_ENABLE_PROMPT
+        self.debug_enable_response = _DEBUG_ENABLE_RESPONSE
+        self.debug_verbose_level = _DEBUG_VERBOSE_LEVEL
+        
+        # Optional LRU cache of successful text responses, keyed on prompt, context, temperature and model
+        self.cache_enabled = _GEMINI_CACHE
+        self._text_cache: "OrderedDict[Tuple, Tuple[str, bool]]" = OrderedDict()
+        self._text_cache_lock = threading.Lock()
         
         # Store generation-specific config for later use
         self.generation_settings = generation_settings
@@ -28,9 +130,37 @@ class APIClient:
         # Initialize API key
         self.api_key = self._initialize_api_key()
         
+        # Reuse one pooled HTTP session so keep-alive sockets survive across pages
+        self._session = self._create_session()
+        
+    def _create_session(self) -> requests.Session:
+        """Create a persistent HTTP session with connection pooling.
+        
+        Failed requests are not retried here: callers retry TRANSIENT_ERRORS with their own
+        backoff, and a second layer in the transport would multiply the attempts per call.
+        """
+        session = requests.Session()
+        session.headers.update({
+            "Content-Type": "application/json",
+            "x-goog-api-key": self.api_key
+        })
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+        session.mount("https://", adapter)
+        return session
+
+    def close(self) -> None:
+        """Close the underlying HTTP session and release pooled connections."""
+        self._session.close()
+
+    def __enter__(self) -> "APIClient":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+        
     def _initialize_api_key(self) -> str:
         """Initialize and validate the API key."""
-        api_key = os.getenv("GEMINI_API_KEY")
+        api_key = _GEMINI_API_KEY
         
         # Validate API key
         if not api_key:
@@ -45,24 +175,23 @@ class APIClient:
         
         return api_key
 
-    def make_request(self, url: str, data: Dict[str, Any]) -> Dict[str, Any]:
-        """Make an API request with proper error handling."""
+    def make_request(self, url: str, data: Dict[str, Any], body: Optional[bytes] = None) -> Dict[str, Any]:
+        """Make an API request with proper error handling.
+        
+        `body` is `data` already serialized, for callers that send the same payload more than once.
+        """
         # Log the exact prompt being sent to the API (for debugging)
         if self.debug_enable_prompt and 'contents' in data and len(data['contents']) > 0:
             self._log_prompt_debug(data)
         
         # Make the API request
         try:
-            headers = {
-                "Content-Type": "application/json",
-                "x-goog-api-key": self.api_key
-            }
-            
-            response = requests.post(url, headers=headers, json=data)
+            # Serialize the body ourselves; Content-Type is already set on the session
+            response = self._session.post(url, data=body if body is not None else _json_dumps_bytes(data), timeout=(5, 120))
             
             # Check if the request was successful
             if response.status_code == 200:
-                response_json = response.json()
+                response_json = _json_loads(response.content)
                 
                 # Debug the response if enabled
                 if self.debug_enable_response:
@@ -72,6 +201,12 @@ class APIClient:
             else:
                 self._handle_error_response(response)
                 
+        except requests.exceptions.Timeout as e:
+            logger.error(f"Request timed out: {str(e)}")
+            raise TimeoutError(f"API request timed out: {str(e)}")
+        except requests.exceptions.ConnectionError as e:
+            logger.error(f"Connection failed: {str(e)}")
+            raise ConnectionError(f"API request failed: {str(e)}")
         except requests.exceptions.RequestException as e:
             logger.error(f"Request failed: {str(e)}")
             raise Exception(f"API request failed: {str(e)}")
@@ -98,18 +233,18 @@ class APIClient:
             full_prompt = "\n".join(text_parts)
             
             # Find character count sections
-            char_count_match = re.search(r"TOTAL CHARACTERS: EXACTLY (\d+)", full_prompt)
+            char_count_match = _CHAR_COUNT_RE.search(full_prompt)
             if char_count_match:
                 logger.info(f"Specified character count: {char_count_match.group(1)}")
             
             # Find character names
-            char_names = re.findall(r"Character: ([^\|]+)", full_prompt)
+            char_names = _CHAR_NAMES_RE.findall(full_prompt)
             if char_names:
                 logger.info(f"Characters in prompt: {', '.join(char_names)}")
                 logger.info(f"Total characters found in prompt: {len(char_names)}")
             
             # Find anti-duplication rules
-            anti_dup_section = re.search(r"ANTI-DUPLICATION INSTRUCTIONS.*?(?=ART STYLE|\Z)", full_prompt, re.DOTALL)
+            anti_dup_section = _ANTI_DUP_RE.search(full_prompt)
             if anti_dup_section:
                 logger.info(f"Anti-duplication section exists: {len(anti_dup_section.group(0))} characters")
         
@@ -117,47 +252,52 @@ class APIClient:
 
     def _log_response_debug(self, response_json: Dict[str, Any]) -> None:
         """Log response debugging information."""
+        if not self.debug_enable_response:
+            return
+        
         logger.info("===== RESPONSE DEBUGGING =====")
         
         # Check for candidates
         if 'candidates' in response_json:
             logger.info(f"Number of candidates: {len(response_json['candidates'])}")
             
-            # Check each candidate
-            for idx, candidate in enumerate(response_json['candidates']):
-                logger.info(f"Candidate {idx + 1}:")
-                
-                # Check for content in candidate
-                if 'content' in candidate:
-                    content = candidate['content']
+            # Per-part details are only walked at verbose level 2+
+            if self.debug_verbose_level >= 2:
+                # Check each candidate
+                for idx, candidate in enumerate(response_json['candidates']):
+                    logger.info(f"Candidate {idx + 1}:")
                     
-                    # Check for parts in content
-                    if 'parts' in content:
-                        parts = content['parts']
-                        logger.info(f"  Number of parts: {len(parts)}")
+                    # Check for content in candidate
+                    if 'content' in candidate:
+                        content = candidate['content']
                         
-                        # Check each part
-                        for part_idx, part in enumerate(parts):
-                            logger.info(f"  Part {part_idx + 1} type: {list(part.keys())}")
-                            
-                            # For text parts, log the text
-                            if 'text' in part and self.debug_verbose_level >= 2:
-                                text_preview = part['text'][:100] + "..." if len(part['text']) > 100 else part['text']
-                                logger.info(f"    Text preview: {text_preview}")
+                        # Check for parts in content
+                        if 'parts' in content:
+                            parts = content['parts']
+                            logger.info(f"  Number of parts: {len(parts)}")
                             
-                            # For inline data, log mime type and data length
-                            if 'inlineData' in part:
-                                mime_type = part['inlineData'].get('mimeType', 'unknown')
-                                data_length = len(part['inlineData'].get('data', ''))
-                                logger.info(f"    Inline data: {mime_type}, length: {data_length}")
+                            # Check each part
+                            for part_idx, part in enumerate(parts):
+                                logger.info(f"  Part {part_idx + 1} type: {list(part.keys())}")
                                 
-                                # For image data, log additional info
-                                if mime_type.startswith('image/') and data_length == 0:
-                                    logger.error(f"    Empty image data detected! MIME type is {mime_type} but data length is 0")
+                                # For text parts, log the text
+                                if 'text' in part:
+                                    text_preview = part['text'][:100] + "..." if len(part['text']) > 100 else part['text']
+                                    logger.info(f"    Text preview: {text_preview}")
+                                
+                                # For inline data, log mime type and data length
+                                if 'inlineData' in part:
+                                    mime_type = part['inlineData'].get('mimeType', 'unknown')
+                                    data_length = len(part['inlineData'].get('data', ''))
+                                    logger.info(f"    Inline data: {mime_type}, length: {data_length}")
+                                    
+                                    # For image data, log additional info
+                                    if mime_type.startswith('image/') and data_length == 0:
+                                        logger.error(f"    Empty image data detected! MIME type is {mime_type} but data length is 0")
+                        else:
+                            logger.info("  No parts found in content")
                     else:
-                        logger.info("  No parts found in content")
-                else:
-                    logger.info("  No content found in candidate")
+                        logger.info("  No content found in candidate")
         else:
             logger.warning("No candidates found in response")
         
@@ -166,12 +306,37 @@ class APIClient:
             if key != 'candidates':
                 logger.info(f"Response contains '{key}'")
         
-        # If response has a specific structure, check for other expected fields
-        if self.debug_verbose_level >= 2:
-            logger.info(f"Full response structure: {json.dumps(response_json, indent=2, default=str)[:500]}...")
+        # Dump the structure only at the highest verbosity, with inline payloads stripped and built lazily
+        if self.debug_verbose_level >= 3:
+            logger.opt(lazy=True).info(
+                "Full response structure: {}...",
+                lambda: _json_dumps_pretty(self._summarize_response(response_json))[:500]
+            )
         
         logger.info("===== END RESPONSE DEBUGGING =====")
 
+    @staticmethod
+    def _summarize_response(response_json: Dict[str, Any]) -> Dict[str, Any]:
+        """Return a copy of the response with inline data payloads replaced by their length."""
+        summary = {k: v for k, v in response_json.items() if k != 'candidates'}
+        if 'candidates' in response_json:
+            candidates = []
+            for candidate in response_json['candidates']:
+                content = candidate.get('content', {})
+                parts = []
+                for part in content.get('parts', []):
+                    if 'inlineData' in part:
+                        inline = part['inlineData']
+                        parts.append({'inlineData': {
+                            'mimeType': inline.get('mimeType', 'unknown'),
+                            'data': f"<{len(inline.get('data', ''))} chars>"
+                        }})
+                    else:
+                        parts.append(part)
+                candidates.append({**candidate, 'content': {**content, 'parts': parts}})
+            summary['candidates'] = candidates
+        return summary
+
     def _handle_error_response(self, response: requests.Response) -> None:
         """Handle error responses from the API."""
         if response.status_code == 403:
@@ -185,6 +350,21 @@ class APIClient:
                 pass
             logger.error(error_msg)
             raise Exception(error_msg)
+        elif response.status_code == 429:
+            # Surface rate limits distinctly so callers can back off and retry
+            retry_after = response.headers.get('Retry-After')
+            try:
+                retry_after = float(retry_after) if retry_after is not None else None
+            except ValueError:
+                retry_after = None
+            error_msg = f"API request failed with status code 429: rate limit exceeded"
+            logger.error(error_msg)
+            raise RateLimitError(error_msg, retry_after)
+        elif response.status_code in (500, 502, 503, 504):
+            # Server-side hiccups are worth retrying, like rate limits
+            error_msg = f"API request failed with status code {response.status_code}: server error"
+            logger.error(error_msg)
+            raise ServerError(error_msg)
         else:
             # Handle other API errors
             error_msg = f"API request failed with status code {response.status_code}"
@@ -198,6 +378,35 @@ class APIClient:
             logger.error(error_msg)
             raise Exception(error_msg)
 
+    def _text_cache_key(self, kind: str, prompt: str, temperature: float, history: Optional[list] = None, page_number: Optional[int] = None) -> Tuple:
+        """Build a cache key for a text request from a digest of its inputs."""
+        digest = hashlib.sha256()
+        for text in (history or []):
+            digest.update(text.encode('utf-8'))
+            digest.update(b'\0')
+        digest.update(prompt.encode('utf-8'))
+        return (kind, digest.hexdigest(), temperature, page_number, self.model)
+
+    def _text_cache_get(self, key: Tuple) -> Optional[Tuple[str, bool]]:
+        """Return a cached text result and mark it most recently used, or None."""
+        if not self.cache_enabled:
+            return None
+        with self._text_cache_lock:
+            result = self._text_cache.get(key)
+            if result is not None:
+                self._text_cache.move_to_end(key)
+            return result
+
+    def _text_cache_put(self, key: Tuple, result: Tuple[str, bool]) -> None:
+        """Store a successful text result, evicting the least recently used entry when full."""
+        if not self.cache_enabled or not result[1]:
+            return
+        with self._text_cache_lock:
+            self._text_cache[key] = result
+            self._text_cache.move_to_end(key)
+            if len(self._text_cache) > _GEMINI_CACHE_SIZE:
+                self._text_cache.popitem(last=False)
+
     def get_api_url(self, model_name: Optional[str] = None) -> str:
         """Get the API URL for the specified model."""
         model = model_name or self.model
@@ -208,21 +417,16 @@ class APIClient:
         # Use the stored generation_settings 
         gen_config_section = self.generation_settings.get('config', {})
         
-        generation_config = {
-            "temperature": temperature,
-            "topP": gen_config_section.get('top_p', 0.9),
-            "topK": gen_config_section.get('top_k', 40),
-            "maxOutputTokens": gen_config_section.get('max_output_tokens', 8192),
-        }
-        
-        if seed is not None:
-            generation_config["seed"] = seed
-        
-        # Different models support different responseModalities
-        model_name = self.model.lower()
+        generation_config = dict(_build_generation_config(
+            temperature,
+            seed,
+            gen_config_section.get('top_p', 0.9),
+            gen_config_section.get('top_k', 40),
+            gen_config_section.get('max_output_tokens', 8192),
+        ))
         
         # Add responseModalities for models that support image generation
-        if "gemini" in model_name and ("image-generation" in model_name or "-flash-exp" in model_name or "-1.5" in model_name):
+        if self._supports_image_modalities:
             generation_config["responseModalities"] = ["Text", "Image"]
         
         return generation_config 
@@ -230,85 +434,80 @@ class APIClient:
     def _extract_story_text_from_response(self, full_text: str, page_number: Optional[int] = None) -> str:
         """Extract just the story text from the full API response using heuristics."""
         # Heuristic 1: Check for specific markers
-        if "TEXT START" in full_text and "TEXT END" in full_text:
-            start_idx = full_text.find("TEXT START") + len("TEXT START")
-            end_idx = full_text.find("TEXT END")
-            if start_idx < end_idx:
-                extracted_text = full_text[start_idx:end_idx].strip()
-                if extracted_text: 
-                    logger.debug(f"Extracted text using START/END markers (Page {page_number or 'N/A'}).")
-                    return extracted_text
+        _, start_marker, rest = full_text.partition("TEXT START")
+        if start_marker:
+            body, end_marker, _ = rest.partition("TEXT END")
+            extracted_text = body.strip()
+            if end_marker and extracted_text:
+                logger.debug(f"Extracted text using START/END markers (Page {page_number or 'N/A'}).")
+                return extracted_text
 
         lines = full_text.split('\\n')
+        
+        # The remaining heuristics are gathered in a single pass and applied in priority order:
+        # 2) lines after a "text:" marker, 3) quoted lines, 4) lines after a page header, then a plain fallback
         story_lines = []
-        in_story_section = False
+        story_mode = _STORY_LOOKING
+        quoted_lines = []
+        page_header_re = re.compile(rf'(^|\s)page {page_number}(\s|$)') if page_number is not None else None
+        header_candidates = []
+        header_lines_left = -1  # -1 until the page header is found
+        fallback_lines = []
 
-        # Heuristic 2: Look for lines after "text:" marker
         for line in lines:
-            line_lower = line.strip().lower()
-            if not line_lower: continue
-            # Allow variations like "Story Text:" or "Page Text:"
-            if any(marker in line_lower for marker in ["text:", "story text:", "page text:"]):
-                in_story_section = True
-                # Check if the text follows immediately on the same line after the marker
-                marker_pos = -1
-                for marker in ["text:", "story text:", "page text:"]:
-                    if marker in line_lower:
-                        marker_pos = line_lower.find(marker) + len(marker)
+            stripped = line.strip()
+            line_lower = stripped.lower()
+            plain = ':' not in line and not line.startswith(_HEADING_PREFIXES)
+
+            if stripped and story_mode != _STORY_DONE:
+                # Allow variations like "Story Text:" or "Page Text:" (all contain "text:")
+                marker_pos = line_lower.find(_STORY_TEXT_MARKER)
+                if marker_pos != -1:
+                    story_mode = _STORY_COLLECTING
+                    # Keep any text that follows the marker on the same line
+                    if potential_text := line[marker_pos + len(_STORY_TEXT_MARKER):].strip():
+                        story_lines.append(potential_text)
+                elif any(stop_marker in line_lower for stop_marker in _STORY_STOP_MARKERS) and story_mode == _STORY_COLLECTING:
+                    # Stop collecting at the end of the story part
+                    if story_lines:
                         break
-                if marker_pos != -1 and len(line) > marker_pos:
-                    potential_text = line[marker_pos:].strip()
-                    if potential_text:
-                       story_lines.append(potential_text)
-                continue # Move to the next line after finding the marker
-
-            # Stop if we hit common markers indicating the end of the story part
-            if any(stop_marker in line_lower for stop_marker in ["illustration:", "image prompt:", "visual description:", "scene description:"]):
-                 # If we were in a story section, stop collecting
-                 if in_story_section:
-                     break 
-                 # Otherwise, continue scanning in case the text marker appears later
-
-            if in_story_section: 
-                story_lines.append(line.strip())
+                    story_mode = _STORY_DONE
+                elif story_mode == _STORY_COLLECTING:
+                    story_lines.append(stripped)
+
+            if stripped.count('"') >= 2 and len(stripped) > 2:
+                # Filter out potential non-story quoted lines (like settings)
+                quoted = stripped.strip('"')
+                if ':' not in quoted and not quoted.lower().startswith(_QUOTED_SKIP_PREFIXES):
+                    quoted_lines.append(quoted)
+
+            if header_lines_left > 0:
+                # Look for plausible story lines in the next few lines, avoiding very short ones
+                header_lines_left -= 1
+                if stripped and plain and len(line.split()) > 2:
+                    header_candidates.append(stripped)
+            elif header_lines_left == -1 and page_header_re is not None and page_header_re.search(line.lower()):
+                header_lines_left = 5
+
+            if stripped and plain and len(fallback_lines) < 3:
+                fallback_lines.append(stripped)
 
         if story_lines:
             logger.debug(f"Extracted text using 'text:' marker heuristic (Page {page_number or 'N/A'}).")
             return "\\n".join(story_lines).strip()
 
         # Heuristic 3: Try lines enclosed in double quotes
-        quoted_lines = [l.strip().strip('"') for l in lines if l.strip().count('"') >= 2 and len(l.strip()) > 2]
         if quoted_lines:
-             # Filter out potential non-story quoted lines (like settings)
-             filtered_quoted_lines = [ql for ql in quoted_lines if ':' not in ql and not ql.lower().startswith(("scene:", "character:", "setting:"))]
-             if filtered_quoted_lines:
-                 logger.debug(f"Extracted text using quote heuristic (Page {page_number or 'N/A'}).")
-                 return "\\n".join(filtered_quoted_lines).strip()
-
+            logger.debug(f"Extracted text using quote heuristic (Page {page_number or 'N/A'}).")
+            return "\\n".join(quoted_lines).strip()
 
         # Heuristic 4: Try lines after a page header (if page_number provided)
-        if page_number is not None:
-            page_marker_found_idx = -1
-            for i, line in enumerate(lines):
-                # Look for "page X" or "Page X" at the start or end of a line
-                if re.search(rf'(^|\s)page {page_number}(\s|$)', line.lower()):
-                    page_marker_found_idx = i
-                    break
-            
-            if page_marker_found_idx != -1:
-                # Look for plausible story lines in the next few lines
-                candidate_lines = [l.strip() for l in lines[page_marker_found_idx+1 : page_marker_found_idx+6] 
-                                   if l.strip() and 
-                                   not l.startswith(('#', '**', '-')) and 
-                                   ':' not in l and
-                                   len(l.split()) > 2] # Avoid single-word lines or very short lines
-                if candidate_lines:
-                    logger.debug(f"Extracted text using page header heuristic (Page {page_number}).")
-                    # Join first few plausible lines, but limit length
-                    return "\\n".join(candidate_lines[:3]).strip() 
+        if header_candidates:
+            logger.debug(f"Extracted text using page header heuristic (Page {page_number}).")
+            # Join first few plausible lines, but limit length
+            return "\\n".join(header_candidates[:3]).strip()
 
         # Fallback: Return the first 3 non-empty, non-heading lines if specific markers fail
-        fallback_lines = [l.strip() for l in lines if l.strip() and not l.startswith(('#', '**', '-')) and ':' not in l][:3]
         if fallback_lines:
             logger.warning(f"Using fallback extraction (first 3 non-empty lines) for page {page_number or 'N/A'}.")
             return "\\n".join(fallback_lines).strip()
@@ -322,9 +521,20 @@ class APIClient:
         
         Returns:
             Tuple[str, bool]: (extracted_story_text, success)
+        
+        Raises:
+            RateLimitError, ServerError, TimeoutError, ConnectionError: transient failures, left for the caller to retry.
         """
+        temperature = temperature if temperature is not None else 0.7 # Use provided temp or default
+        
+        # Serve identical requests from the response cache when enabled
+        cache_key = self._text_cache_key('story', prompt, temperature, conversation_history, page_number)
+        if (cached := self._text_cache_get(cache_key)) is not None:
+            logger.info(f"Using cached story text response (Page {page_number or 'N/A'}).")
+            return cached
+        
         # Use conversation history for context if available
-        generation_input = conversation_history.copy() if conversation_history else []
+        generation_input = list(conversation_history) if conversation_history else []
         generation_input.append(prompt)
         
         # Prepare the request data
@@ -333,7 +543,7 @@ class APIClient:
                 {"role": "user", "parts": [{"text": p}]} if i % 2 == 0 else {"role": "model", "parts": [{"text": p}]}
                 for i, p in enumerate(generation_input)
             ],
-            "generationConfig": self.get_generation_config(temperature=temperature if temperature is not None else 0.7), # Use provided temp or default
+            "generationConfig": self.get_generation_config(temperature=temperature),
             "safetySettings": self.safety_settings
         }
         
@@ -350,6 +560,7 @@ class APIClient:
                     if full_text_response:
                         # Extract the story text using the new helper method
                         extracted_text = self._extract_story_text_from_response(full_text_response, page_number)
+                        self._text_cache_put(cache_key, (extracted_text, True))
                         return extracted_text, True
                     else:
                         logger.error("API response candidate part contained no text.")
@@ -361,6 +572,8 @@ class APIClient:
                 logger.error("API response did not contain valid candidates.")
                 return "", False
 
+        except TRANSIENT_ERRORS:
+            raise
         except Exception as e:
             logger.error(f"Error during text generation API call or processing: {str(e)}")
             return "", False
@@ -371,6 +584,12 @@ class APIClient:
         Returns:
             Tuple[str, bool]: (generated_text, success)
         """
+        # Serve identical requests from the response cache when enabled
+        cache_key = self._text_cache_key('backup', prompt, temperature)
+        if (cached := self._text_cache_get(cache_key)) is not None:
+            logger.info("Using cached backup story response.")
+            return cached
+        
         # Prepare the request data
         data = {
             "contents": [
@@ -389,7 +608,8 @@ class APIClient:
         if response and 'candidates' in response and response['candidates']:
             backup_text = response['candidates'][0]['content']['parts'][0]['text'].strip()
             # Clean up any markdown or other formatting
-            backup_text = backup_text.replace('*', '').replace('#', '').replace('`', '')
+            backup_text = backup_text.translate(_MD_STRIP_TABLE)
+            self._text_cache_put(cache_key, (backup_text, True))
             return backup_text, True
         else:
             return "", False
@@ -406,6 +626,9 @@ class APIClient:
             
         Returns:
             Optional[List[str]]: List of base64 encoded image strings, or None on failure.
+        
+        Raises:
+            RateLimitError, ServerError, TimeoutError, ConnectionError: transient failures, left for the caller to retry.
         """
         logger.info(f"Generating image (Page: {page_number if page_number is not None else 'N/A'}) - Ref Image: {'Yes' if reference_image_b64 else 'No'}")
 
@@ -437,7 +660,7 @@ class APIClient:
 
             # Add the generic consistency note (prioritizing text for character details)
             # This should come AFTER specific override rules but BEFORE the image data
-            parts.append({"text": "\n**CRITICAL CONSISTENCY NOTE:** Use the text-based \"CHARACTER INSTRUCTIONS\" (especially rules marked with \"ALWAYS\") as the PRIMARY source for character appearance details (features, clothing, colors). Use the reference image below MAINLY for overall style, color palette, character placement, and general visual guidance. If the reference image contradicts a specific \"ALWAYS\" rule in the text, FOLLOW THE TEXT RULE."})
+            parts.append(_REFERENCE_CONSISTENCY_PART)
 
             # Add the image data itself
             parts.append({
@@ -453,22 +676,21 @@ class APIClient:
                 "role": "user",
                 "parts": parts # Use the dynamically created parts list
             }],
-            "generationConfig": {
-                "temperature": 0.4, # TODO: Consider making these configurable
-                "top_p": 1,
-                "top_k": 32,
-                "responseModalities": ["Text", "Image"] # Expect both back
-            }
+            "generationConfig": _IMAGE_GENERATION_CONFIG
         }
         
         # Add safety settings if provided
         if safety_settings:
             data["safetySettings"] = safety_settings
         
+        # Serialize once: the reference image makes the body several MB of JSON, and the
+        # fallback model is sent exactly the same payload
+        body = _json_dumps_bytes(data)
+        
         # Attempt with primary model
         url = self.get_api_url(self.model)
         try:
-            response = self.make_request(url, data)
+            response = self.make_request(url, data, body)
             images = self._extract_images_from_response(response)
             if images:
                 logger.info(f"Successfully generated image using primary model: {self.model}")
@@ -479,8 +701,8 @@ class APIClient:
             url = self.get_api_url(self.fallback_model)
             
             # Ensure fallback request still has the correct parts and config
-            # (Data dict is already prepared correctly above)
-            response = self.make_request(url, data)
+            # (Data dict is already prepared and serialized above)
+            response = self.make_request(url, data, body)
             images = self._extract_images_from_response(response)
             if images:
                  logger.info(f"Successfully generated image using fallback model: {self.fallback_model}")
@@ -489,6 +711,8 @@ class APIClient:
                 logger.error(f"Fallback model ({self.fallback_model}) also failed to return a valid image.")
                 return None # Return None if both fail
             
+        except TRANSIENT_ERRORS:
+            raise
         except Exception as e:
             logger.error(f"Image generation failed critically: {str(e)}")
             # Optionally, re-raise the exception if needed upstream
@@ -504,13 +728,19 @@ class APIClient:
         images = []
         for candidate in response['candidates']:
             content = candidate.get('content', {})
-            for part in content.get('parts', []):
-                if 'inlineData' in part and part['inlineData'].get('mimeType', '').startswith('image/'):
-                    image_data = part['inlineData'].get('data')
-                    if image_data and isinstance(image_data, str) and len(image_data) > 100: # Basic check for non-empty image data
-                        images.append(image_data)
-                    else:
-                        logger.warning(f"Found image part but data seems invalid or empty. MimeType: {part['inlineData'].get('mimeType')}, Data Length: {len(image_data) if image_data else 0}")
+            for part in content.get('parts', ()):
+                # Look up the inline payload once per part and skip non-image parts early
+                inline_data = part.get('inlineData')
+                if not isinstance(inline_data, dict):
+                    continue
+                mime_type = inline_data.get('mimeType') or ''
+                if not mime_type.startswith('image/'):
+                    continue
+                image_data = inline_data.get('data')
+                if image_data and isinstance(image_data, str) and len(image_data) > 100: # Basic check for non-empty image data
+                    images.append(image_data)
+                else:
+                    logger.warning(f"Found image part but data seems invalid or empty. MimeType: {mime_type}, Data Length: {len(image_data) if image_data else 0}")
 
         if not images:
             logger.warning("No valid image data found in any response candidates.")
@@ -1,12 +1,17 @@
 import os
+from xml.sax.saxutils import escape
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, Optional
 from loguru import logger
-from PIL import Image
 import reportlab
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter
 from reportlab.lib.units import inch
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.platypus import Paragraph
+from reportlab.lib.utils import ImageReader
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 import ebooklib
@@ -15,6 +20,69 @@ from bs4 import BeautifulSoup
 import html2text
 from datetime import datetime
 
+# --- Output templates (str.format fields; literal braces are doubled) --- #
+
+_HTML_HEADER_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+    <title>{title}</title>
+    <style>
+        body {{ font-family: "Arial", sans-serif; max-width: 800px; margin: 0 auto; padding: 20px; }}
+        .page {{ margin-bottom: 30px; page-break-after: always; }}
+        .page-number {{ text-align: center; font-size: 12px; color: #888; margin-top: 10px; }}
+        img {{ max-width: 100%; display: block; margin: 20px auto; border-radius: 5px; box-shadow: 0 4px 8px rgba(0,0,0,0.1); }}
+        .text {{ font-size: 18px; line-height: 1.6; margin: 20px 0; }}
+        @media print {{
+            .page {{ page-break-after: always; }}
+            body {{ margin: 0; padding: 0; }}
+        }}
+    </style>
+</head>
+<body>"""
+
+_HTML_COVER_TEMPLATE = """
+    <div class="page cover">
+        <h1 style="text-align:center;margin-top:100px;font-size:32px;">{title}</h1>
+        <div style="text-align:center;margin-top:20px;font-style:italic;">Generated by Amer-DK</div>
+        <div style="text-align:center;margin-top:80px;">
+            <p>A story about {main_name} and {supporting_name}</p>
+        </div>
+    </div>"""
+
+_HTML_PAGE_TEMPLATE = """
+    <div class="page">
+        <div class="text">{story_text}</div>
+        <img src="page_{page_num:02d}.png" alt="Illustration for page {page_num}">
+        <div class="page-number">{page_num}</div>
+    </div>"""
+
+_HTML_FOOTER = """
+</body>
+</html>"""
+
+_EPUB_TITLE_TEMPLATE = '''<html><head><title>Title</title></head><body><h1>{title}</h1><p>{author}</p></body></html>'''
+
+_EPUB_CHAPTER_TEMPLATE = """
+            <?xml version='1.0' encoding='utf-8'?>
+            <!DOCTYPE html>
+            <html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops">
+            <head>
+                <title>Page {page_num}</title>
+                <style>
+                    /* Basic styling for image-only pages */
+                    body {{ margin: 0; padding: 0; }}
+                    img {{ display: block; max-width: 100%; max-height: 98vh; margin: auto; /* Centered, fills most of the view height */ }}
+                </style>
+            </head>
+            <body>
+                {img_tag}
+                <!-- Text paragraph removed as text is overlaid on the image -->
+                <!-- Page number can be added if desired, but often omitted in picture books -->
+                <!-- <div style="text-align: center; font-size: 0.8em; color: #888;">{page_num}</div> -->
+            </body>
+            </html>
+            """
+
 class BookFormatter:
     """Handles different book formats and their generation."""
     
@@ -41,6 +109,9 @@ class BookFormatter:
         
         # Register fonts for PDF generation
         self._register_fonts()
+        
+        # Shared PDF body text style, reused across pages so reportlab's font metric caches stay warm
+        self._pdf_text_style = ParagraphStyle('body', fontName='Helvetica', fontSize=12, leading=14) # TODO: Make font/size configurable?
     
     def _register_fonts(self):
         """Register fonts for PDF generation."""
@@ -53,73 +124,67 @@ class BookFormatter:
                 except Exception as e:
                     logger.warning(f"Could not register font {font_file}: {e}")
     
-    def create_html_book(self) -> Path:
+    def _load_page_texts(self) -> Dict[int, str]:
+        """Read every page's story text once, substituting a placeholder for missing pages."""
+        page_texts = {}
+        output_dir = self.output_dir
+        for page_num in range(1, self.book_config['page_count'] + 1):
+            story_text_file = output_dir / f"page_{page_num:02d}" / "story_text.txt"
+            if story_text_file.exists():
+                page_texts[page_num] = story_text_file.read_text(encoding='utf-8').strip()
+            else:
+                page_texts[page_num] = f"[Text for page {page_num} not available]"
+        return page_texts
+    
+    def _load_page_images(self) -> Dict[int, bytes]:
+        """Read every existing processed page image once, keyed by page number."""
+        page_images = {}
+        processed_dir = self.processed_dir
+        for page_num in range(1, self.book_config['page_count'] + 1):
+            image_file = processed_dir / f"page_{page_num:02d}.png"
+            if image_file.exists():
+                page_images[page_num] = image_file.read_bytes()
+        return page_images
+    
+    def create_html_book(self, page_texts: Optional[Dict[int, str]] = None) -> Path:
         """Create an HTML version of the book.
         
+        Args:
+            page_texts: Optional pre-read mapping of page number to story text
+        
         Returns:
             Path to the generated HTML file
         """
+        if page_texts is None:
+            page_texts = self._load_page_texts()
+        title = self.book_config['title']
+        page_count = self.book_config['page_count']
+        main_name = self.characters_config['main_character']['name']
+        supporting_name = self.characters_config['supporting_character']['name']
         html_file = self.processed_dir / "book.html"
         
-        html_content = """<!DOCTYPE html>
-<html>
-<head>
-    <title>%s</title>
-    <style>
-        body { font-family: "Arial", sans-serif; max-width: 800px; margin: 0 auto; padding: 20px; }
-        .page { margin-bottom: 30px; page-break-after: always; }
-        .page-number { text-align: center; font-size: 12px; color: #888; margin-top: 10px; }
-        img { max-width: 100%%; display: block; margin: 20px auto; border-radius: 5px; box-shadow: 0 4px 8px rgba(0,0,0,0.1); }
-        .text { font-size: 18px; line-height: 1.6; margin: 20px 0; }
-        @media print {
-            .page { page-break-after: always; }
-            body { margin: 0; padding: 0; }
-        }
-    </style>
-</head>
-<body>""" % self.book_config['title']
+        html_parts = [_HTML_HEADER_TEMPLATE.format(title=title)]
         
         # Add cover page
-        html_content += f"""
-    <div class="page cover">
-        <h1 style="text-align:center;margin-top:100px;font-size:32px;">{self.book_config['title']}</h1>
-        <div style="text-align:center;margin-top:20px;font-style:italic;">Generated by Amer-DK</div>
-        <div style="text-align:center;margin-top:80px;">
-            <p>A story about {self.characters_config['main_character']['name']} and {self.characters_config['supporting_character']['name']}</p>
-        </div>
-    </div>"""
+        html_parts.append(_HTML_COVER_TEMPLATE.format(title=title, main_name=main_name, supporting_name=supporting_name))
         
         # Add each page
-        for page_num in range(1, self.book_config['page_count'] + 1):
-            story_text_file = self.output_dir / f"page_{page_num:02d}" / "story_text.txt"
-            image_file_rel = f"page_{page_num:02d}.png"
-            
-            if story_text_file.exists():
-                with open(story_text_file, 'r') as f:
-                    story_text = f.read().strip()
-            else:
-                story_text = f"[Text for page {page_num} not available]"
-            
-            html_content += f"""
-    <div class="page">
-        <div class="text">{story_text}</div>
-        <img src="{image_file_rel}" alt="Illustration for page {page_num}">
-        <div class="page-number">{page_num}</div>
-    </div>"""
+        for page_num in range(1, page_count + 1):
+            html_parts.append(_HTML_PAGE_TEMPLATE.format(story_text=page_texts[page_num], page_num=page_num))
         
         # Close HTML
-        html_content += """
-</body>
-</html>"""
+        html_parts.append(_HTML_FOOTER)
         
-        with open(html_file, 'w') as f:
-            f.write(html_content)
+        html_file.write_bytes("".join(html_parts).encode('utf-8'))
             
         logger.info(f"Created HTML book file at {html_file}")
         return html_file
     
-    def create_pdf_book(self) -> Path:
+    def create_pdf_book(self, page_texts: Optional[Dict[int, str]] = None, page_images: Optional[Dict[int, bytes]] = None) -> Path:
         """Create a PDF version of the book, formatted for KDP."""
+        if page_texts is None:
+            page_texts = self._load_page_texts()
+        page_images = page_images or {}
         
         # --- Read Print Settings --- #
         print_settings = self.print_settings
@@ -178,6 +243,7 @@ class BookFormatter:
 
         # --- Add each story page --- #
         total_pages = self.book_config['page_count']
+        processed_dir = self.processed_dir
         for page_num in range(1, total_pages + 1):
             
             # --- Determine Page-Specific Margins --- #
@@ -201,30 +267,18 @@ class BookFormatter:
             content_y_end_pts = content_y_start_pts + content_h_pts
 
             # --- Get Page Content --- #
-            story_text_file = self.output_dir / f"page_{page_num:02d}" / "story_text.txt"
-            image_file = self.processed_dir / f"page_{page_num:02d}.png" # Use the overlayed image
-            
-            story_text = f"[Text for page {page_num} not available]"
-            if story_text_file.exists():
-                with open(story_text_file, 'r') as f:
-                    story_text = f.read().strip()
+            image_file = processed_dir / f"page_{page_num:02d}.png" # Use the overlayed image
+            story_text = page_texts[page_num]
             
             # --- Draw Text (within content box) --- # 
-            # TODO: Implement text flow within the content box (content_x_start_pts, content_y_start_pts, content_w_pts, content_h_pts)
-            # This requires more complex text flow logic than just beginText/textLines if text is long.
-            # For simplicity now, just place it near the top of the content box.
-            c.setFont("Helvetica", 12) # TODO: Make font/size configurable?
-            text_object = c.beginText(content_x_start_pts, content_y_end_pts - 12) # Start near top-left of content box
-            # Basic wrapping attempt (might need improvement with Paragraph)
-            available_width = content_w_pts
-            lines = self._simple_text_wrap(story_text, c._fontname, c._fontsize, available_width)
-            for line in lines:
-                text_object.textLine(line)
-            # text_object.textLines(story_text) # Old method - no wrapping
-            c.drawText(text_object)
+            # Paragraph wraps on real font metrics; anchor its top at the top of the content box
+            paragraph = Paragraph(escape(story_text).replace('\n', '<br/>'), self._pdf_text_style)
+            _, text_h_pts = paragraph.wrapOn(c, content_w_pts, content_h_pts)
+            paragraph.drawOn(c, content_x_start_pts, content_y_end_pts - text_h_pts)
             
             # --- Draw Image --- #
-            if image_file.exists():
+            image_bytes = page_images.get(page_num)
+            if image_bytes is not None or image_file.exists():
                 try:
                     # Draw image, handling bleed
                     self._draw_page_image_kdp(
@@ -238,7 +292,8 @@ class BookFormatter:
                         content_x_start_pts, 
                         content_y_start_pts,
                         content_w_pts,
-                        content_h_pts
+                        content_h_pts,
+                        image_bytes=image_bytes
                     )
                 except Exception as e:
                     logger.error(f"Error drawing image for page {page_num}: {e}")
@@ -257,34 +312,12 @@ class BookFormatter:
         logger.info(f"Created KDP PDF book file at {pdf_file}")
         return pdf_file
 
-    def _simple_text_wrap(self, text: str, font_name: str, font_size: int, max_width: float) -> List[str]:
-        """Very basic text wrapper based on character estimate."""
-        # This is rudimentary. ReportLab's Paragraph is much better.
-        avg_char_width = font_size * 0.5 # Rough estimate
-        chars_per_line = int(max_width / avg_char_width) if avg_char_width > 0 else 50
-        
-        lines = []
-        words = text.split()
-        current_line = ""
-        for word in words:
-            if not current_line:
-                current_line = word
-            else:
-                test_line = current_line + " " + word
-                # Estimate length - again, very rough
-                if len(test_line) <= chars_per_line:
-                    current_line = test_line
-                else:
-                    lines.append(current_line)
-                    current_line = word
-        if current_line:
-            lines.append(current_line)
-        return lines
-
-    def _draw_page_image_kdp(self, c, image_path, page_w_pts, page_h_pts, bleed_pts, has_bleed, target_dpi, cx, cy, cw, ch):
+    def _draw_page_image_kdp(self, c, image_path, page_w_pts, page_h_pts, bleed_pts, has_bleed, target_dpi, cx, cy, cw, ch, image_bytes=None):
         """Draws the page image, handling bleed and scaling for KDP."""
-        img = Image.open(image_path)
-        img_w_px, img_h_px = img.size
+        # A single reader serves both the size check and drawImage, so the PNG is decoded once.
+        # Prefer already-read bytes so the file is not read from disk again.
+        img_reader = ImageReader(BytesIO(image_bytes) if image_bytes is not None else image_path)
+        img_w_px, img_h_px = img_reader.getSize()
         
         # Check source image resolution against target
         # For full bleed, image needs to cover page_w_pts x page_h_pts at target_dpi
@@ -318,7 +351,7 @@ class BookFormatter:
         # but default scaling (preserveAspectRatio=True) is usually safer.
         # Let's scale to fit the target area while preserving aspect ratio.
         c.drawImage(
-            image_path, 
+            img_reader, 
             target_x, 
             target_y, 
             width=target_w, 
@@ -327,12 +360,19 @@ class BookFormatter:
             anchor='c' # Center the image within the target box
         )
 
-    def create_epub_book(self) -> Path:
+    def create_epub_book(self, page_texts: Optional[Dict[int, str]] = None, page_images: Optional[Dict[int, bytes]] = None) -> Path:
         """Create an EPUB version of the book.
         
+        Args:
+            page_texts: Optional pre-read mapping of page number to story text
+            page_images: Optional pre-read mapping of page number to processed PNG bytes
+        
         Returns:
             Path to the generated EPUB file
         """
+        if page_texts is None:
+            page_texts = self._load_page_texts()
+        page_images = page_images or {}
         epub_file = self.processed_dir / "book.epub"
         book = epub.EpubBook()
         
@@ -381,8 +421,7 @@ class BookFormatter:
         cover_image_path = self.output_dir / "cover_final.png"
         if cover_image_path.exists():
             try:
-                with open(cover_image_path, 'rb') as f:
-                    cover_content = f.read()
+                cover_content = cover_image_path.read_bytes()
                 # Use a standard name like cover.png or cover.jpg internally in the EPUB
                 cover_ext = cover_image_path.suffix.lstrip('.') # e.g., 'png'
                 cover_item_name = f'cover.{cover_ext}'
@@ -395,64 +434,42 @@ class BookFormatter:
         else:
             logger.warning("Cover image file not found for EPUB.")
             # Optionally, add a simple text title page if no cover image
-            title_html = f'''<html><head><title>Title</title></head><body><h1>{self.book_config["title"]}</h1><p>{author}</p></body></html>'''
+            title_html = _EPUB_TITLE_TEMPLATE.format(title=self.book_config["title"], author=author)
             title_page = epub.EpubHtml(title='Title Page', file_name='title.xhtml', content=title_html)
             book.add_item(title_page)
             chapters.append(title_page) # Add to content list
             book.spine.append(title_page) # Add to spine
 
         # Add page images to the book items first
-        page_images = []
-        for page_num in range(1, self.book_config['page_count'] + 1):
-            image_file = self.processed_dir / f"page_{page_num:02d}.png"
-            if image_file.exists():
+        page_count = self.book_config['page_count']
+        processed_dir = self.processed_dir
+        page_image_names = []
+        for page_num in range(1, page_count + 1):
+            image_file = processed_dir / f"page_{page_num:02d}.png"
+            image_content = page_images.get(page_num)
+            if image_content is not None or image_file.exists():
                 try:
-                    with open(image_file, 'rb') as f:
-                        image_content = f.read()
+                    if image_content is None:
+                        image_content = image_file.read_bytes()
                     img_item_name = f'images/page_{page_num:02d}.png'
                     epub_image = epub.EpubImage(uid=f'img_{page_num}', file_name=img_item_name, media_type='image/png', content=image_content)
                     book.add_item(epub_image)
-                    page_images.append(img_item_name) # Keep track of the item name
+                    page_image_names.append(img_item_name) # Keep track of the item name
                 except Exception as e:
                     logger.warning(f"Failed to add page image {image_file} to EPUB: {e}")
             else:
-                 page_images.append(None) # Placeholder if image is missing
+                 page_image_names.append(None) # Placeholder if image is missing
 
         # Add each page content (HTML chapter referencing the image)
-        for page_num in range(1, self.book_config['page_count'] + 1):
-            story_text_file = self.output_dir / f"page_{page_num:02d}" / "story_text.txt"
-            
-            if story_text_file.exists():
-                with open(story_text_file, 'r') as f:
-                    story_text = f.read().strip()
-            else:
-                story_text = f"[Text for page {page_num} not available]"
+        for page_num in range(1, page_count + 1):
+            story_text = page_texts[page_num]
             
             # Get corresponding image item name
-            img_item_name = page_images[page_num-1] if page_num <= len(page_images) else None
+            img_item_name = page_image_names[page_num-1] if page_num <= len(page_image_names) else None
             img_tag = f'<img src="{img_item_name}" alt="Illustration for page {page_num}"/>' if img_item_name else "<!-- Image not available -->"
 
             # Create chapter HTML containing only the image
-            chapter_html = f"""
-            <?xml version='1.0' encoding='utf-8'?>
-            <!DOCTYPE html>
-            <html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops">
-            <head>
-                <title>Page {page_num}</title>
-                <style>
-                    /* Basic styling for image-only pages */
-                    body {{ margin: 0; padding: 0; }}
-                    img {{ display: block; max-width: 100%; max-height: 98vh; margin: auto; /* Centered, fills most of the view height */ }}
-                </style>
-            </head>
-            <body>
-                {img_tag}
-                <!-- Text paragraph removed as text is overlaid on the image -->
-                <!-- Page number can be added if desired, but often omitted in picture books -->
-                <!-- <div style="text-align: center; font-size: 0.8em; color: #888;">{page_num}</div> -->
-            </body>
-            </html>
-            """
+            chapter_html = _EPUB_CHAPTER_TEMPLATE.format(page_num=page_num, img_tag=img_tag)
             
             # Use first few words of text for a more meaningful TOC title
             toc_title = ' '.join(story_text.split()[:5]) + '...' if story_text else f'Page {page_num}'
@@ -481,28 +498,27 @@ class BookFormatter:
         logger.info(f"Created EPUB book file at {epub_file}")
         return epub_file
     
-    def create_text_book(self) -> Path:
+    def create_text_book(self, page_texts: Optional[Dict[int, str]] = None) -> Path:
         """Create a text-only version of the book.
         
+        Args:
+            page_texts: Optional pre-read mapping of page number to story text
+        
         Returns:
             Path to the generated text file
         """
+        if page_texts is None:
+            page_texts = self._load_page_texts()
+        title = self.book_config['title']
+        page_count = self.book_config['page_count']
         text_file = self.processed_dir / "full_story.txt"
-        text_content = f"# {self.book_config['title']}\n\n"
+        text_parts = [f"# {title}\n\n"]
         
-        for page_num in range(1, self.book_config['page_count'] + 1):
-            story_text_file = self.output_dir / f"page_{page_num:02d}" / "story_text.txt"
-            
-            if story_text_file.exists():
-                with open(story_text_file, 'r') as f:
-                    story_text = f.read().strip()
-            else:
-                story_text = f"[Text for page {page_num} not available]"
-            
-            text_content += f"\n## Page {page_num}\n\n{story_text}\n"
+        for page_num in range(1, page_count + 1):
+            story_text = page_texts[page_num]
+            text_parts.append(f"\n## Page {page_num}\n\n{story_text}\n")
         
-        with open(text_file, 'w') as f:
-            f.write(text_content)
+        text_file.write_bytes("".join(text_parts).encode('utf-8'))
             
         logger.info(f"Created full story text file at {text_file}")
         return text_file
@@ -559,14 +575,27 @@ class BookFormatter:
         output_config = self.output_formats_config
   
         try:
-            if output_config.get('html', False):
-                formats['html'] = self.create_html_book()
-            if output_config.get('pdf', False):
-                formats['pdf'] = self.create_pdf_book()
-            if output_config.get('epub', False):
-                formats['epub'] = self.create_epub_book()
-            if output_config.get('text', False):
-                formats['text'] = self.create_text_book()
+            # Read each page's story text once and share it across all formats
+            page_texts = self._load_page_texts()
+            # PDF and EPUB both read every page image; when both are requested, read them once
+            page_images = None
+            if output_config.get('pdf', False) and output_config.get('epub', False):
+                page_images = self._load_page_images()
+            
+            builders = {
+                'html': lambda: self.create_html_book(page_texts),
+                'pdf': lambda: self.create_pdf_book(page_texts, page_images),
+                'epub': lambda: self.create_epub_book(page_texts, page_images),
+                'text': lambda: self.create_text_book(page_texts),
+            }
+            requested = [name for name in builders if output_config.get(name, False)]
+            
+            # Formats share only read-only inputs and write distinct files, so build them concurrently
+            if requested:
+                with ThreadPoolExecutor(max_workers=len(requested)) as executor:
+                    futures = {name: executor.submit(builders[name]) for name in requested}
+                    for name, future in futures.items():
+                        formats[name] = future.result()
         except Exception as e:
             logger.error(f"Error creating requested book formats: {e}")
             raise
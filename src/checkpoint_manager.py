@@ -1,30 +1,340 @@
 import os
-import pickle
+import atexit
+import queue
+import threading
+import time
+from collections import deque
+from collections.abc import MutableSet
 from pathlib import Path
 from datetime import datetime
+import msgspec
 from loguru import logger
-from typing import Dict, Set, List, Optional, Any
+from typing import Deque, Dict, Iterable, Iterator, List, Optional, Any
+
+class PageSet(MutableSet):
+    """Set of page numbers backed by an int bitmap (bit n set means page n is present)."""
+    __slots__ = ('_bits',)
+
+    def __init__(self, pages: Iterable[int] = ()):
+        self._bits = 0
+        for page in pages:
+            self.add(page)
+
+    @classmethod
+    def from_bytes(cls, buf: bytes) -> 'PageSet':
+        """Rebuild a PageSet from to_bytes() output."""
+        pages = cls()
+        pages._bits = int.from_bytes(buf, 'little')
+        return pages
+
+    def to_bytes(self) -> bytes:
+        """Serialize the bitmap, one byte per eight pages."""
+        return self._bits.to_bytes((self._bits.bit_length() + 7) // 8, 'little')
+
+    def __contains__(self, page: object) -> bool:
+        return isinstance(page, int) and page >= 0 and (self._bits >> page) & 1 == 1
+
+    def __iter__(self) -> Iterator[int]:
+        bits = self._bits
+        while bits:
+            lowest = bits & -bits
+            yield lowest.bit_length() - 1
+            bits ^= lowest
+
+    def __len__(self) -> int:
+        return self._bits.bit_count()
+
+    def __repr__(self) -> str:
+        return f"PageSet({sorted(self)})"
+
+    def add(self, page: int) -> None:
+        if page < 0:
+            raise ValueError(f"Page number must be non-negative: {page}")
+        self._bits |= 1 << page
+
+    def discard(self, page: int) -> None:
+        if page in self:
+            self._bits &= ~(1 << page)
+
+    def difference_update(self, pages: Iterable[int]) -> None:
+        """Remove several pages at once with a single mask."""
+        mask = 0
+        for page in pages:
+            if isinstance(page, int) and page >= 0:
+                mask |= 1 << page
+        self._bits &= ~mask
+
+    def copy(self) -> 'PageSet':
+        pages = PageSet()
+        pages._bits = self._bits
+        return pages
+
+class CheckpointState(msgspec.Struct, array_like=True):
+    """On-disk checkpoint schema (page sets are stored as bitmap bytes).
+
+    Encoded as a positional array, so field names are not repeated in every
+    snapshot; only append new fields at the end.
+    """
+    output_dir: Optional[str] = None
+    completed_pages: bytes = b""
+    last_attempted_page: int = 0
+    previous_descriptions: Dict[int, str] = {}
+    conversation_history: List[str] = []
+    pages_with_images: bytes = b""
+    original_image_files: Dict[int, str] = {}
+    timestamp: float = 0.0  # time.time(); formatted only when logged
+    is_complete: bool = False
+
+class _LazyCheckpointState(CheckpointState):
+    """Load-side schema: the large string maps stay raw until first access."""
+    previous_descriptions: msgspec.Raw = msgspec.Raw(b"\x80")
+    original_image_files: msgspec.Raw = msgspec.Raw(b"\x80")
+
+# Shared MessagePack codec, built once instead of per save/load
+_ENCODER = msgspec.msgpack.Encoder()
+_DECODER = msgspec.msgpack.Decoder(_LazyCheckpointState)
+_STR_MAP_DECODER = msgspec.msgpack.Decoder(Dict[int, str])
+_RECORD_DECODER = msgspec.msgpack.Decoder()
+
+def _encode_frame(obj: Any, frame: Optional[bytearray] = None) -> bytearray:
+    """Encode obj as MessagePack behind a 4-byte big-endian length prefix, without an extra copy.
+
+    Pass a bytearray as frame to reuse its allocation; it is resized in place.
+    """
+    if frame is None:
+        frame = bytearray(4)
+    _ENCODER.encode_into(obj, frame, 4)
+    frame[:4] = (len(frame) - 4).to_bytes(4, 'big')
+    return frame
+
+# Journal records are (op, args) frames with a 4-byte big-endian length prefix;
+# only these setters may be replayed from disk
+_JOURNAL_OPS = frozenset({
+    'set_output_dir', 'add_completed_page', 'remove_completed_page',
+    'update_last_attempted_page', 'add_page_description', 'remove_page_description',
+    'add_to_conversation_history', 'add_page_with_image', 'remove_page_with_image',
+    'add_original_image_file', 'remove_original_image_file',
+})
+_JOURNAL_COMPACT_BYTES = 1024 * 1024
+_IOV_MAX = os.sysconf('SC_IOV_MAX') if hasattr(os, 'sysconf') else 1024
+
+# Coalesce bursts of mutations into one write per interval / batch of ops
+_FLUSH_INTERVAL = 0.5
+_MAX_PENDING_OPS = 32
+
+class _LazyStrMap:
+    """Attribute holding a page -> str map that may still be an undecoded msgspec.Raw slice."""
+
+    def __init__(self, expand: Optional[str] = None):
+        # Optional owner method applied to the map right after decoding
+        self._expand = expand
+
+    def __set_name__(self, owner, name):
+        self._slot = f"_{name}"
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        value = obj.__dict__[self._slot]
+        if isinstance(value, msgspec.Raw):
+            value = _STR_MAP_DECODER.decode(value)
+            if self._expand:
+                value = getattr(obj, self._expand)(value)
+            obj.__dict__[self._slot] = value
+        return value
+
+    def __set__(self, obj, value):
+        obj.__dict__[self._slot] = value
 
 class CheckpointManager:
-    def __init__(self, checkpoint_file: str = "book_generation_checkpoint.pkl"):
+    # Decoded from the snapshot on first access; saved back verbatim if never touched.
+    # These stay plain dicts: BookGenerator, SceneManager and PromptManager share and
+    # mutate them as dicts, and until decoded they already sit in one contiguous blob.
+    previous_descriptions = _LazyStrMap()
+    original_image_files = _LazyStrMap(expand='_expand_image_paths')
+
+    def __init__(self, checkpoint_file: str = "book_generation_checkpoint.msgpack"):
         """Initialize the checkpoint manager with a checkpoint file path."""
-        self.checkpoint_file = Path(checkpoint_file)
+        # Absolute, so writes made at exit don't depend on the working directory at that point
+        self.checkpoint_file = Path(checkpoint_file).resolve()
+        self.journal_file = self.checkpoint_file.with_suffix('.log')
         
         # Initialize state variables
-        self.output_dir: Optional[Path] = None
-        self.completed_pages: Set[int] = set()
-        self.last_attempted_page: int = 0
-        self.previous_descriptions: Dict[int, str] = {}
-        self.conversation_history: List[str] = []
-        self.pages_with_images: Set[int] = set()
-        self.original_image_files: Dict[int, str] = {}
+        self._reset_state()
+        
+        # Journal state: frames waiting to be appended and the open log fd
+        self._pending_frames: List[bytes] = []
+        self._journal_fd: Optional[int] = None
+        self._journal_size = 0
+        self._replaying = False
+        
+        # Debounced write state
+        self._dirty = False
+        self._pending_ops = 0
+        self._last_flush = time.monotonic()
+        
+        # Disk I/O runs on a background writer fed in order through this queue
+        self._queue: queue.Queue = queue.Queue()
+        self._compact_requested = False
+        self._lock = threading.RLock()  # Guards pending frames; setters may run on worker threads
+        self._snapshot_buf = bytearray(4096)  # Owned by the writer thread
+        self._closed = False
+        self._writer = threading.Thread(target=self._writer_loop, name="checkpoint-writer", daemon=True)
+        self._writer.start()
         
         # Try to load existing checkpoint
-        self._load_checkpoint()
+        if self._load_state() is None:
+            # Checkpoints used to be pickled; those are no longer read, so say why a new book starts
+            legacy_file = self.checkpoint_file.with_suffix('.pkl')
+            if legacy_file.exists():
+                logger.warning(f"Found old pickle checkpoint {legacy_file}, which is no longer supported; "
+                               f"starting a new book (finish or delete the old run with the previous version)")
+        
+        # Make sure coalesced changes reach disk on interpreter exit
+        atexit.register(self.flush)
+
+    def _build_state(self, is_complete: bool) -> CheckpointState:
+        """Snapshot the in-memory state into a CheckpointState for the writer."""
+        return CheckpointState(
+            output_dir=str(self.output_dir) if self.output_dir else None,
+            completed_pages=self.completed_pages.to_bytes(),
+            last_attempted_page=self.last_attempted_page,
+            previous_descriptions=self._copy_map(self._previous_descriptions),
+            conversation_history=list(self.conversation_history),
+            pages_with_images=self.pages_with_images.to_bytes(),
+            original_image_files=self._compact_image_paths(self._original_image_files),
+            timestamp=time.time(),
+            is_complete=is_complete
+        )
 
     def _save_checkpoint(self) -> None:
-        """Save checkpoint data to file."""
-        checkpoint_data = {
+        """Save a full snapshot to file and truncate the journal."""
+        # is_complete is set by the book generator via mark_as_complete
+        self._enqueue_snapshot(is_complete=False)
+            
+        logger.info(f"Checkpoint saved: {len(self.completed_pages)} pages completed")
+
+    @staticmethod
+    def _copy_map(value: Any) -> Any:
+        """Copy a page map for the writer thread; undecoded Raw slices are immutable."""
+        return dict(value) if isinstance(value, dict) else value
+
+    def _compact_image_paths(self, files: Any) -> Any:
+        """Store image paths under output_dir relative to it, so the shared prefix is written once."""
+        if not isinstance(files, dict):
+            return files  # Still the raw snapshot slice, already in stored form
+        if not self.output_dir:
+            return dict(files)
+        prefix = os.path.join(str(self.output_dir), '')
+        return {
+            page: path[len(prefix):] if path.startswith(prefix) else os.path.abspath(path)
+            for page, path in list(files.items())  # Atomic copy; pages may be added from worker threads
+        }
+
+    def _expand_image_paths(self, files: Dict[int, str]) -> Dict[int, str]:
+        """Inverse of _compact_image_paths; absolute paths pass through os.path.join unchanged."""
+        if not self.output_dir:
+            return files
+        # Rewrite values in place: the decoder already sized this dict, and
+        # overwriting existing keys never triggers a resize
+        prefix = str(self.output_dir)
+        for page, path in files.items():
+            files[page] = os.path.join(prefix, path)
+        return files
+
+    def _enqueue_snapshot(self, is_complete: bool) -> CheckpointState:
+        """Hand a snapshot to the writer; it supersedes every queued journal frame."""
+        with self._lock:
+            state = self._build_state(is_complete)
+            self._pending_frames.clear()
+            self._compact_requested = False
+            self._reset_dirty()
+            self._queue.put(('snapshot', state))
+        return state
+
+    def _writer_loop(self) -> None:
+        """Background writer: drain queued tasks in order, coalescing superseded ones.
+        
+        A None task (queued by close) stops the writer once everything before it is written.
+        """
+        while True:
+            tasks = [self._queue.get()]
+            while tasks[-1] is not None:
+                try:
+                    tasks.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = tasks[-1] is None
+            try:
+                self._write_tasks(tasks[:-1] if stop else tasks)
+            except Exception as e:
+                logger.error(f"Error writing checkpoint: {str(e)}")
+            finally:
+                for _ in tasks:
+                    self._queue.task_done()
+            if stop:
+                if self._journal_fd is not None:
+                    os.close(self._journal_fd)
+                    self._journal_fd = None
+                return
+
+    def _write_tasks(self, tasks: List[tuple]) -> None:
+        """Write a drained batch: only the newest snapshot, then the frames queued after it.
+        
+        A 'clear' task deletes the checkpoint files and supersedes everything queued before it.
+        """
+        clear_index = max((i for i, (kind, _) in enumerate(tasks) if kind == 'clear'), default=-1)
+        if clear_index >= 0:
+            self._drop_journal()
+            if self.checkpoint_file.exists():
+                os.remove(self.checkpoint_file)
+                logger.info("Checkpoint cleared")
+            tasks = tasks[clear_index + 1:]
+        snapshot_index = max((i for i, (kind, _) in enumerate(tasks) if kind == 'snapshot'), default=-1)
+        if snapshot_index >= 0:
+            # Reuse one frame buffer for every snapshot this writer encodes
+            self._write_snapshot(_encode_frame(tasks[snapshot_index][1], self._snapshot_buf))
+            self._drop_journal()
+        frames = [frame for kind, batch in tasks[snapshot_index + 1:] if kind == 'frames' for frame in batch]
+        if frames:
+            self._append_frames(frames)
+            if self._journal_size > _JOURNAL_COMPACT_BYTES:
+                self._compact_requested = True
+
+    @staticmethod
+    def encode_state(state: CheckpointState) -> bytes:
+        """Serialize a state as a length-prefixed MessagePack frame, usable on disk or over a transport."""
+        return _encode_frame(state)
+
+    @staticmethod
+    def decode_state(buf: bytes) -> CheckpointState:
+        """Parse a frame produced by encode_state; large string maps are left as msgspec.Raw."""
+        size = int.from_bytes(buf[:4], 'big')
+        if len(buf) < 4 + size:
+            raise ValueError(f"Truncated checkpoint frame: expected {size} bytes, got {len(buf) - 4}")
+        return _DECODER.decode(memoryview(buf)[4:4 + size])
+
+    def _write_snapshot(self, buf: bytes) -> None:
+        """Atomically replace the snapshot file: write a temp file, sync it, rename (writer thread)."""
+        tmp_file = self.checkpoint_file.with_name(self.checkpoint_file.name + '.tmp')
+        fd = os.open(tmp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            view = memoryview(buf)
+            while view:
+                view = view[os.write(fd, view):]
+            # fdatasync skips the metadata flush; not available on every platform
+            getattr(os, 'fdatasync', os.fsync)(fd)
+        finally:
+            os.close(fd)
+        os.replace(tmp_file, self.checkpoint_file)
+
+    def _load_checkpoint(self) -> Optional[Dict[str, Any]]:
+        """Load checkpoint data from file and return it as a dict."""
+        state = self._load_state()
+        if state is None:
+            return None
+            
+        return {
             'output_dir': str(self.output_dir) if self.output_dir else None,
             'completed_pages': self.completed_pages,
             'last_attempted_page': self.last_attempted_page,
@@ -32,57 +342,184 @@ class CheckpointManager:
             'conversation_history': self.conversation_history,
             'pages_with_images': self.pages_with_images,
             'original_image_files': self.original_image_files,
-            'timestamp': datetime.now().isoformat(),
-            'is_complete': False  # This will be set by the book generator
+            'timestamp': state.timestamp,
+            'is_complete': state.is_complete
         }
-        
-        with open(self.checkpoint_file, 'wb') as f:
-            pickle.dump(checkpoint_data, f)
-            
-        logger.info(f"Checkpoint saved: {len(self.completed_pages)} pages completed")
 
-    def _load_checkpoint(self) -> Optional[Dict[str, Any]]:
-        """Load checkpoint data from file."""
-        if not self.checkpoint_file.exists():
+    def _load_state(self) -> Optional[CheckpointState]:
+        """Load the snapshot from file and replay the journal on top of it."""
+        # Push any buffered records out first so the replay sees them
+        self.flush()
+        if not self.checkpoint_file.exists() and not self.journal_file.exists():
             return None
             
         try:
-            with open(self.checkpoint_file, 'rb') as f:
-                checkpoint_data = pickle.load(f)
-                
+            if self.checkpoint_file.exists():
+                state = self.decode_state(self.checkpoint_file.read_bytes())
+            else:
+                state = _LazyCheckpointState()
+            
+            # Update state variables from the snapshot
+            self.output_dir = Path(state.output_dir) if state.output_dir else None
+            self.completed_pages = PageSet.from_bytes(state.completed_pages)
+            self.last_attempted_page = state.last_attempted_page
+            # Raw.copy() detaches the undecoded maps from the file buffer so the
+            # whole snapshot is not kept alive until both maps are decoded
+            self.previous_descriptions = state.previous_descriptions.copy()
+            self.conversation_history = deque(state.conversation_history, maxlen=10)
+            self.pages_with_images = PageSet.from_bytes(state.pages_with_images)
+            self.original_image_files = state.original_image_files.copy()
+            
+            # Apply the changes recorded since that snapshot; any change
+            # after completion means the book is being regenerated
+            if self._replay_journal():
+                state.is_complete = False
+            
             # If the book is complete, ask if user wants to regenerate pages
-            if checkpoint_data.get('is_complete', False):
+            if state.is_complete:
                 logger.info("Book generation is complete. Use --regenerate to regenerate specific pages.")
-            
-            # Update state variables from checkpoint data
-            if checkpoint_data.get('output_dir'):
-                self.output_dir = Path(checkpoint_data['output_dir'])
-            self.completed_pages = checkpoint_data.get('completed_pages', set())
-            self.last_attempted_page = checkpoint_data.get('last_attempted_page', 0)
-            self.previous_descriptions = checkpoint_data.get('previous_descriptions', {})
-            self.conversation_history = checkpoint_data.get('conversation_history', [])
-            self.pages_with_images = checkpoint_data.get('pages_with_images', set())
-            self.original_image_files = checkpoint_data.get('original_image_files', {})
                 
-            return checkpoint_data
+            return state
         except Exception as e:
             logger.error(f"Error loading checkpoint: {str(e)}")
             return None
 
+    def _replay_journal(self) -> int:
+        """Re-apply the length-prefixed (op, args) records from the journal."""
+        if not self.journal_file.exists():
+            return 0
+        buf = memoryview(self.journal_file.read_bytes())  # Slice records without copying
+        offset = 0
+        replayed = 0
+        self._replaying = True
+        try:
+            while offset + 4 <= len(buf):
+                size = int.from_bytes(buf[offset:offset + 4], 'big')
+                if offset + 4 + size > len(buf):
+                    logger.warning("Ignoring truncated record at the end of the checkpoint journal")
+                    break
+                op, args = _RECORD_DECODER.decode(buf[offset + 4:offset + 4 + size])
+                offset += 4 + size
+                if op not in _JOURNAL_OPS:
+                    logger.warning(f"Ignoring unknown checkpoint journal op: {op}")
+                    continue
+                getattr(self, op)(*args)
+                replayed += 1
+        finally:
+            self._replaying = False
+        return replayed
+
+    def _record(self, op: str, *args: Any) -> None:
+        """Queue a journal record for a mutation and mark state dirty."""
+        if self._replaying:
+            return
+        frame = _encode_frame((op, args))
+        with self._lock:
+            self._pending_frames.append(frame)
+            self._mark_dirty()
+
+    def _drop_journal(self) -> None:
+        """Remove the journal once a snapshot covers everything in it."""
+        if self._journal_fd is not None:
+            os.close(self._journal_fd)
+            self._journal_fd = None
+        if self.journal_file.exists():
+            os.remove(self.journal_file)
+        self._journal_size = 0
+
+    def compact(self) -> None:
+        """Fold the journal into a fresh snapshot."""
+        self._save_checkpoint()
+
     def clear_checkpoint(self) -> None:
         """Clear the checkpoint file."""
-        if self.checkpoint_file.exists():
-            os.remove(self.checkpoint_file)
-            logger.info("Checkpoint cleared")
+        # Hold the lock so no setter queues a record until the files are gone and the state is reset
+        with self._lock:
+            # Discard unwritten changes; the writer owns the journal fd, so it deletes the files
+            self._pending_frames.clear()
+            self._compact_requested = False
+            self._reset_dirty()
+            if self._closed:
+                self._write_tasks([('clear', None)])  # No writer left; this thread owns the files now
+            else:
+                self._queue.put(('clear', None))
+                self._queue.join()
             
-        # Reset state variables
-        self.output_dir = None
-        self.completed_pages = set()
-        self.last_attempted_page = 0
-        self.previous_descriptions = {}
-        self.conversation_history = []
-        self.pages_with_images = set()
-        self.original_image_files = {}
+            # Reset state variables
+            self._reset_state()
+
+    def _reset_state(self) -> None:
+        """Set every checkpointed field to its empty value."""
+        self.output_dir: Optional[Path] = None
+        self.completed_pages: PageSet = PageSet()
+        self.last_attempted_page: int = 0
+        self.previous_descriptions: Dict[int, str] = {}
+        self.conversation_history: Deque[str] = deque(maxlen=10)  # Keep only last 10 exchanges
+        self.pages_with_images: PageSet = PageSet()
+        self.original_image_files: Dict[int, str] = {}
+
+    def _reset_dirty(self) -> None:
+        """Record that the on-disk checkpoint matches the in-memory state."""
+        self._dirty = False
+        self._pending_ops = 0
+        self._last_flush = time.monotonic()
+
+    def _mark_dirty(self) -> None:
+        """Record a mutation and flush once enough time or ops have accumulated."""
+        self._dirty = True
+        self._pending_ops += 1
+        self._flush_pending(force=self._pending_ops >= _MAX_PENDING_OPS)
+
+    def _flush_pending(self, force: bool) -> None:
+        """Hand pending frames to the writer; unless forced, only after the debounce interval."""
+        with self._lock:
+            if self._compact_requested:
+                self.compact()
+                return
+            if not self._dirty:
+                return
+            if not force and time.monotonic() - self._last_flush < _FLUSH_INTERVAL:
+                return
+            self._queue.put(('frames', self._pending_frames))
+            self._pending_frames = []
+            self._reset_dirty()
+
+    def flush(self) -> None:
+        """Write all pending changes and wait until they are on disk."""
+        if self._closed:
+            return
+        self._flush_pending(force=True)
+        self._queue.join()
+
+    def close(self) -> None:
+        """Write all pending changes, then stop the writer thread and drop the exit hook.
+        
+        Changes made after closing are no longer written.
+        """
+        if self._closed:
+            return
+        self.flush()
+        atexit.unregister(self.flush)
+        self._closed = True
+        self._queue.put(None)
+        self._writer.join()
+
+    def _append_frames(self, frames: List[bytes]) -> None:
+        """Append a batch of journal frames with a single vectored write (writer thread)."""
+        if self._journal_fd is None:
+            self._journal_fd = os.open(self.journal_file, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            self._journal_size = os.fstat(self._journal_fd).st_size
+        # os.writev is POSIX-only and capped at IOV_MAX buffers per call;
+        # elsewhere (or after a short write) fall back to plain writes
+        for start in range(0, len(frames), _IOV_MAX):
+            batch = frames[start:start + _IOV_MAX]
+            total = sum(len(frame) for frame in batch)
+            written = os.writev(self._journal_fd, batch) if hasattr(os, 'writev') else 0
+            if written < total:
+                remaining = b"".join(batch)[written:]
+                while remaining:
+                    remaining = remaining[os.write(self._journal_fd, remaining):]
+            self._journal_size += total
 
     def save(self) -> None:
         """Save the current state to checkpoint."""
@@ -90,81 +527,75 @@ class CheckpointManager:
 
     def set_output_dir(self, output_dir: Path) -> None:
         """Set the output directory and save checkpoint."""
-        self.output_dir = output_dir
-        self.save()
+        # Stored image paths are relative to the current output dir; resolve them first
+        self.original_image_files
+        self.output_dir = Path(output_dir)
+        self._record('set_output_dir', str(output_dir))
+        # A new run's output dir is a critical point: another manager on this file must resume it
+        if not self._replaying:
+            self.flush()
 
     def add_completed_page(self, page_number: int) -> None:
         """Add a completed page and save checkpoint."""
         self.completed_pages.add(page_number)
-        self.save()
+        self._record('add_completed_page', page_number)
 
     def remove_completed_page(self, page_number: int) -> None:
         """Remove a completed page and save checkpoint."""
         if page_number in self.completed_pages:
             self.completed_pages.remove(page_number)
-            self.save()
+            self._record('remove_completed_page', page_number)
 
     def update_last_attempted_page(self, page_number: int) -> None:
         """Update the last attempted page and save checkpoint."""
+        if page_number == self.last_attempted_page:
+            return
         self.last_attempted_page = page_number
-        self.save()
+        self._record('update_last_attempted_page', page_number)
 
     def add_page_description(self, page_number: int, description: str) -> None:
         """Add a page description and save checkpoint."""
         self.previous_descriptions[page_number] = description
-        self.save()
+        self._record('add_page_description', page_number, description)
 
     def remove_page_description(self, page_number: int) -> None:
         """Remove a page description and save checkpoint."""
         if page_number in self.previous_descriptions:
             del self.previous_descriptions[page_number]
-            self.save()
+            self._record('remove_page_description', page_number)
 
     def add_to_conversation_history(self, text: str) -> None:
         """Add text to conversation history and save checkpoint."""
         self.conversation_history.append(text)
-        # Keep only last 10 exchanges
-        if len(self.conversation_history) > 10:
-            self.conversation_history = self.conversation_history[-10:]
-        self.save()
+        self._record('add_to_conversation_history', text)
 
     def add_page_with_image(self, page_number: int) -> None:
         """Add a page that has an image and save checkpoint."""
         self.pages_with_images.add(page_number)
-        self.save()
+        self._record('add_page_with_image', page_number)
 
     def remove_page_with_image(self, page_number: int) -> None:
         """Remove a page that has an image and save checkpoint."""
         if page_number in self.pages_with_images:
             self.pages_with_images.remove(page_number)
-            self.save()
+            self._record('remove_page_with_image', page_number)
 
     def add_original_image_file(self, page_number: int, file_path: str) -> None:
         """Add an original image file path and save checkpoint."""
         self.original_image_files[page_number] = file_path
-        self.save()
+        self._record('add_original_image_file', page_number, file_path)
 
     def remove_original_image_file(self, page_number: int) -> None:
         """Remove an original image file path and save checkpoint."""
         if page_number in self.original_image_files:
             del self.original_image_files[page_number]
-            self.save()
+            self._record('remove_original_image_file', page_number)
 
     def mark_as_complete(self) -> None:
         """Mark the book generation as complete and save checkpoint."""
-        checkpoint_data = {
-            'output_dir': str(self.output_dir) if self.output_dir else None,
-            'completed_pages': self.completed_pages,
-            'last_attempted_page': self.last_attempted_page,
-            'previous_descriptions': self.previous_descriptions,
-            'conversation_history': self.conversation_history,
-            'pages_with_images': self.pages_with_images,
-            'original_image_files': self.original_image_files,
-            'timestamp': datetime.now().isoformat(),
-            'is_complete': True
-        }
         
-        with open(self.checkpoint_file, 'wb') as f:
-            pickle.dump(checkpoint_data, f)
+        # Completion is a critical point: wait until it is on disk
+        state = self._enqueue_snapshot(is_complete=True)
+        self._queue.join()
             
-        logger.info("Book generation marked as complete") 
\ No newline at end of file
+        logger.info(f"Book generation marked as complete at {datetime.fromtimestamp(state.timestamp).isoformat()}") 
\ No newline at end of file
@@ -1,7 +1,14 @@
 import os
+import re
 import yaml
 import time
-import base64
+import random
+import asyncio
+import functools
+import shutil
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
 from io import BytesIO
 from pathlib import Path
 from datetime import datetime
@@ -14,7 +21,7 @@ from typing import Optional, List, Dict, Any, Tuple
 from .text_overlay_manager import TextOverlayManager
 from .scene_manager import SceneManager
 from .checkpoint_manager import CheckpointManager
-from .api_client import APIClient
+from .api_client import APIClient, RateLimitError, TRANSIENT_ERRORS
 from .book_formatter import BookFormatter
 from .transition_manager import TransitionManager
 from .image_processor import process_and_save_images
@@ -23,11 +30,124 @@ from .prompt_manager import PromptManager
 # Load environment variables
 load_dotenv()
 
+# Prefer the libyaml-backed loader when PyYAML was built with it
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
+# Prefer pybase64's SIMD codec for the multi-megabyte reference and cover images when it is installed
+try:
+    from pybase64 import b64decode as _b64decode, b64encode_as_string as _b64encode_str
+except ImportError:
+    from base64 import b64decode as _b64decode, b64encode as _b64encode
+
+    def _b64encode_str(data: bytes) -> str:
+        return _b64encode(data).decode('ascii')
+
 # Helper function to load config (moved from BookGenerator)
 def load_config(config_path: str) -> dict:
     """Load configuration from YAML file."""
-    with open(config_path, 'r') as f:
-        return yaml.safe_load(f)
+    with open(config_path, 'rb') as f:
+        return yaml.load(f, Loader=_YamlLoader)
+
+def retry_with_backoff(max_retries: int = 5, base: float = 2.0, retry_on: Tuple[type, ...] = TRANSIENT_ERRORS):
+    """Retry the wrapped call on transient errors, sleeping base**attempt plus jitter between tries.
+    
+    A Retry-After value carried by a RateLimitError takes precedence over the computed delay.
+    The last error is re-raised once max_retries retries have been used up.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            for attempt in range(max_retries + 1):
+                try:
+                    return func(*args, **kwargs)
+                except retry_on as e:
+                    if attempt == max_retries:
+                        raise
+                    delay = base ** attempt + random.uniform(0, 1)
+                    if isinstance(e, RateLimitError) and e.retry_after is not None:
+                        delay = e.retry_after
+                    logger.warning(f"{func.__name__} failed ({e}); retry {attempt + 1}/{max_retries} in {delay:.1f}s")
+                    time.sleep(delay)
+        return wrapper
+    return decorator
+
+# generation.log sink ids by output directory, so re-created generators (e.g. on retry) share one sink
+_LOG_SINK_IDS: Dict[str, int] = {}
+
+# Patterns used by the prompt duplicate check; per-character ones are compiled once per name
+_TOTAL_CHARS_RE = re.compile(r"TOTAL CHARACTERS: EXACTLY (\d+)")
+
+@functools.lru_cache(maxsize=64)
+def _char_section_re(name: str) -> "re.Pattern[str]":
+    return re.compile(fr"Character: {re.escape(name)}.*?EXACTLY ONCE", re.IGNORECASE | re.DOTALL)
+
+@functools.lru_cache(maxsize=64)
+def _char_req_re(name: str) -> "re.Pattern[str]":
+    return re.compile(fr"{re.escape(name)}.*?MUST APPEAR EXACTLY ONCE", re.IGNORECASE | re.DOTALL)
+
+def _read_image_bytes(path: str) -> bytes:
+    """Read a whole image file with one pread sized from fstat (a plain read where pread is unavailable)."""
+    if not hasattr(os, 'pread'):
+        return Path(path).read_bytes()
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        size = os.fstat(fd).st_size
+        data = os.pread(fd, size, 0)
+        while len(data) < size: # Short read; pick up where it stopped until EOF
+            chunk = os.pread(fd, size - len(data), len(data))
+            if not chunk:
+                break
+            data += chunk
+        return data
+    finally:
+        os.close(fd)
+
+def _read_page_overlay_inputs(page_dir: Path) -> Tuple[bool, Optional[str]]:
+    """Whether a page directory has its original image, and its saved story text (None if it has none).
+    
+    The directory is listed once (one getdents) instead of stat-ing each file.
+    """
+    names = {entry.name for entry in os.scandir(page_dir)}
+    has_original = "image_original_1.png" in names
+    if "story_text.txt" not in names:
+        return has_original, None
+    try:
+        return has_original, (page_dir / "story_text.txt").read_text(encoding='utf-8').strip()
+    except FileNotFoundError:
+        return has_original, None
+
+def _overlay_page(text_overlay_manager: TextOverlayManager, original_image: Path, page_dir: Path,
+                  page_num: int, story_text: str, position: str) -> None:
+    """Copy a page's original image to its text and processed-book copies and overlay the story text on both."""
+    image_with_text = page_dir / "image_1.png"
+    processed_file = page_dir.parent / "processed_book" / f"page_{page_num:02d}.png"
+    
+    # Copy original image to both locations (read once, written twice)
+    original_data = original_image.read_bytes()
+    image_with_text.write_bytes(original_data)
+    processed_file.write_bytes(original_data)
+    
+    # Apply text overlay to both copies
+    text_overlay_manager.apply_text_overlay(image_with_text, story_text, page_num, position=position)
+    text_overlay_manager.apply_text_overlay(processed_file, story_text, page_num, is_final=True, position=position)
+
+# Each overlay worker process gets its own copy of the TextOverlayManager once, via the pool initializer
+_overlay_worker_manager: Optional[TextOverlayManager] = None
+
+def _init_overlay_worker(text_overlay_manager: TextOverlayManager) -> None:
+    global _overlay_worker_manager
+    _overlay_worker_manager = text_overlay_manager
+
+def _overlay_page_in_worker(original_image: Path, page_dir: Path, page_num: int, story_text: str, position: str) -> None:
+    _overlay_page(_overlay_worker_manager, original_image, page_dir, page_num, story_text, position)
+
+@functools.lru_cache(maxsize=16)
+def _b64_of(path: str, mtime: float) -> str:
+    """Base64 of an image file, cached per (path, mtime) since one reference serves many pages."""
+    return _b64encode_str(_read_image_bytes(path))
 
 class BookGenerator:
     def __init__(self, 
@@ -49,10 +169,34 @@ class BookGenerator:
         self.transition_manager = transition_manager
         self.prompt_manager = prompt_manager
         
+        # Page-level API calls back off and retry on rate limits and network blips
+        self._generate_story_text = retry_with_backoff()(self.api_client.generate_story_text)
+        self._generate_image = retry_with_backoff()(self.api_client.generate_image)
+        
+        # Pages that still failed after retries, with the error that stopped them;
+        # they stay incomplete so a resumed run picks them up
+        self.failed_pages: Dict[int, Exception] = {}
+        
+        # Pages generated concurrently by generate_book (1 keeps the sequential loop)
+        self.page_concurrency = max(1, int(self.config.get('generation', {}).get('concurrency', 1)))
+        # Guards original_image_files, which concurrent page workers read and add to
+        self._image_files_lock = threading.Lock()
+        
         # Set target image dimensions
         image_settings = self.config.get('image_settings', {})
         self.image_width = image_settings.get('width', 1024)
         self.image_height = image_settings.get('height', 1024)
+        # Settings handed to the image processor for every page, resolved once
+        self._image_processing_settings = {
+            'target_width': self.image_width,
+            'target_height': self.image_height,
+            'image_format': image_settings.get('format', 'RGB'),
+            'resize_method_name': image_settings.get('resize_method', 'LANCZOS'),
+            'maintain_aspect': image_settings.get('maintain_aspect_ratio', True),
+            'smart_crop': image_settings.get('smart_crop', False),
+            'bg_color': image_settings.get('background_color', 'white'),
+            'compress_level': image_settings.get('png_compress_level', 6)
+        }
         
         # Try to load checkpoint if it exists
         # CheckpointManager is already injected and initialized
@@ -64,33 +208,44 @@ class BookGenerator:
             self.completed_pages = checkpoint_data['completed_pages']
             self.last_attempted_page = checkpoint_data.get('last_attempted_page', 0)
             self.previous_descriptions = checkpoint_data.get('previous_descriptions', {})
-            self.conversation_history = checkpoint_data.get('conversation_history', [])
+            # Own copy as a ring buffer of the last 10 turns (the checkpoint keeps its own)
+            self.conversation_history = deque(checkpoint_data.get('conversation_history', []), maxlen=10)
             self.pages_with_images = checkpoint_data.get('pages_with_images', set())
-            self.original_image_files = checkpoint_data.get('original_image_files', {})
+            # Own copy: the checkpoint's dict is written by its setters from the page workers too
+            self.original_image_files = dict(checkpoint_data.get('original_image_files', {}))
             # Pass loaded previous descriptions to the injected scene manager
             self.scene_manager.set_previous_descriptions(self.previous_descriptions) 
+            # Check the saved original images up front (in parallel) rather than one stat per page later
+            self._ref_mtimes = self._stat_original_images()
         else:
             # Start fresh
             self.output_dir = self._create_output_directory()
             self.completed_pages = set()
             self.last_attempted_page = 0
             self.previous_descriptions = {}
-            self.conversation_history = []
+            self.conversation_history = deque(maxlen=10)
             self.pages_with_images = set()
             self.original_image_files = {}
+            self._ref_mtimes = {}
             self.checkpoint_manager.set_output_dir(self.output_dir)
         
-        # Configure logging
-        logger.add(
-            self.output_dir / "generation.log",
-            rotation="500 MB",
-            level="INFO"
-        )
+        # Configure logging (one sink per output directory, however many generators use it)
+        self._log_sink_key = str(self.output_dir)
+        if self._log_sink_key not in _LOG_SINK_IDS:
+            _LOG_SINK_IDS[self._log_sink_key] = logger.add(
+                self.output_dir / "generation.log",
+                rotation="500 MB",
+                level="INFO"
+            )
         
         # Create outputs directory
         self.processed_dir = self.output_dir / "processed_book"
         self.processed_dir.mkdir(exist_ok=True)
         
+        # Create every page directory up front rather than once per page on the hot path
+        for page_num in range(1, self.config['book']['page_count'] + 1):
+            (self.output_dir / f"page_{page_num:02d}").mkdir(exist_ok=True)
+        
         # Managers are now injected, remove their internal initialization:
         # self.text_overlay_manager = TextOverlayManager(Path("assets/fonts"), self.config)
         # self.scene_manager = SceneManager(self.config)
@@ -103,6 +258,39 @@ class BookGenerator:
         self.fonts_dir.mkdir(parents=True, exist_ok=True)
         self.text_styles = self.text_overlay_manager._initialize_text_styles()
 
+    def _stat_original_images(self) -> Dict[str, float]:
+        """Stat every checkpointed original image in parallel; drop entries whose file is gone.
+        
+        Returns the mtime of each image that still exists, keyed by path.
+        """
+        entries = list(self.original_image_files.items())
+        if not entries:
+            return {}
+        
+        def _mtime(path: str) -> Optional[float]:
+            try:
+                return os.stat(path).st_mtime
+            except OSError:
+                return None
+        
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            mtimes = list(executor.map(_mtime, [path for _, path in entries]))
+        
+        ref_mtimes = {}
+        for (page, path), mtime in zip(entries, mtimes):
+            if mtime is None:
+                logger.warning(f"Original image for page {page} no longer exists ({path}); it won't be used as a reference")
+                self.checkpoint_manager.remove_original_image_file(page)
+                self.original_image_files.pop(page, None)
+            else:
+                ref_mtimes[path] = mtime
+        return ref_mtimes
+
+    def close(self) -> None:
+        """Remove this run's generation.log sink."""
+        if (sink_id := _LOG_SINK_IDS.pop(self._log_sink_key, None)) is not None:
+            logger.remove(sink_id)
+
     def _create_output_directory(self) -> Path:
         """Create a unique output directory for the book."""
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -119,9 +307,7 @@ class BookGenerator:
                 if 0 <= page_number - 1 < len(story_pages):
                     story_text = story_pages[page_number - 1]
                     page_dir = self.output_dir / f"page_{page_number:02d}"
-                    page_dir.mkdir(exist_ok=True)
-                    story_file = page_dir / "story_text.txt"
-                    with open(story_file, 'w') as f: f.write(story_text)
+                    (page_dir / "story_text.txt").write_text(story_text, encoding='utf-8')
                     self.previous_descriptions[page_number] = story_text
                     self.checkpoint_manager.add_page_description(page_number, story_text)
                     logger.info(f"Used predefined text for page {page_number}")
@@ -135,7 +321,7 @@ class BookGenerator:
             
             # Call APIClient to get the *extracted* story text
             # Pass page_number and temperature for better extraction and control
-            extracted_story_text, success = self.api_client.generate_story_text(
+            extracted_story_text, success = self._generate_story_text(
                 prompt, 
                 self.conversation_history, 
                 page_number=page_number,
@@ -143,21 +329,17 @@ class BookGenerator:
             )
             
             if success and extracted_story_text: # Check if text was successfully extracted
-                # Update conversation history (using the extracted text)
+                # Update conversation history (using the extracted text); the deque drops the oldest turns
                 # Note: Might want to store the *full* response in a debug log if needed
                 self.conversation_history.extend([prompt, extracted_story_text])
                 self.checkpoint_manager.add_to_conversation_history(extracted_story_text) # Store extracted text
-                if len(self.conversation_history) > 10:
-                    self.conversation_history = self.conversation_history[-10:]
                 
                 story_text = extracted_story_text # Assign the directly returned text
                 
                 # Save the raw response and the extracted text separately
                 page_dir = self.output_dir / f"page_{page_number:02d}"
-                page_dir.mkdir(exist_ok=True)
                 # Optional: Save the raw response for debugging
-                # with open(page_dir / "text_raw_response.txt", 'w') as f: f.write(raw_response_text_if_needed) 
-                with open(page_dir / "story_text.txt", 'w') as f: f.write(story_text)
+                # (page_dir / "text_raw_response.txt").write_text(raw_response_text_if_needed, encoding='utf-8')
                 
                 # The backup generation logic might still be useful if the *extracted* text is too short
                 if len(story_text.split()) < 5:
@@ -167,8 +349,9 @@ class BookGenerator:
                     backup_story = self._generate_backup_story_text(page_number, story_text) # Pass the extracted text as context maybe?
                     if backup_story:
                         story_text = backup_story # Use backup if successful
-                        # Overwrite story_text.txt with backup
-                        with open(page_dir / "story_text.txt", 'w') as f: f.write(story_text) 
+                
+                # Write the final text once (the backup, if one replaced the extracted text)
+                (page_dir / "story_text.txt").write_text(story_text, encoding='utf-8')
                 
                 # Store final description and update checkpoint
                 self.previous_descriptions[page_number] = story_text
@@ -224,15 +407,21 @@ class BookGenerator:
                 # transition_requirements = self.transition_manager.analyze_transition(page_number, previous_page)
                 # if transition_requirements: logger.info(f"Generated transition requirements for page {page_number}")
 
+            # Work from a snapshot: with page concurrency, other workers add their images meanwhile
+            with self._image_files_lock:
+                original_image_files = self.original_image_files.copy()
+            
             # --- Determine reference page using SceneManager --- #
-            reference_page_num = self.scene_manager.find_reference_page(page_number, self.original_image_files)
+            reference_page_num = self.scene_manager.find_reference_page(page_number, original_image_files, scene_reqs=scene_requirements)
             reference_image_b64 = None
             if reference_page_num:
-                ref_image_path = self.original_image_files.get(reference_page_num)
-                if ref_image_path and os.path.exists(ref_image_path):
+                ref_image_path = original_image_files.get(reference_page_num)
+                ref_mtime = self._ref_mtimes.get(ref_image_path) if ref_image_path else None
+                if ref_image_path and ref_mtime is None and os.path.exists(ref_image_path):
+                    ref_mtime = self._ref_mtimes[ref_image_path] = os.path.getmtime(ref_image_path)
+                if ref_mtime is not None:
                     try:
-                        with open(ref_image_path, 'rb') as f: image_data = f.read()
-                        reference_image_b64 = base64.b64encode(image_data).decode('utf-8')
+                        reference_image_b64 = _b64_of(ref_image_path, ref_mtime)
                         logger.info(f"Found reference image from page {reference_page_num} for page {page_number}")
                         # Note: Reference handling guidance is now handled within APIClient or PromptManager
                     except Exception as e:
@@ -249,12 +438,12 @@ class BookGenerator:
                 scene_requirements=scene_requirements,
                 required_characters=required_characters,
                 reference_page_num=reference_page_num, # Pass the determined ref page
-                original_image_files=self.original_image_files # Pass the dictionary of saved files
+                original_image_files=original_image_files # Pass the dictionary of saved files
             )
             
             # Generate the image using the API client
             # Pass reference_image_b64 directly
-            response = self.api_client.generate_image(
+            response = self._generate_image(
                 prompt_text=final_prompt_text, 
                 reference_image_b64=reference_image_b64, # Pass the loaded image data
                 page_number=page_number,
@@ -273,6 +462,10 @@ class BookGenerator:
             logger.error(f"No images were generated or saved for page {page_number}")
             return None
             
+        except TRANSIENT_ERRORS as e:
+            logger.error(f"Giving up on image for page {page_number} after retries: {str(e)}")
+            self.failed_pages[page_number] = e
+            return None
         except Exception as e:
             logger.error(f"Failed to generate image for page {page_number}: {str(e)}")
             return None
@@ -280,7 +473,6 @@ class BookGenerator:
     def _check_for_character_duplicates(self, prompt: str, required_characters: List[dict]) -> None:
         """Post-process check for potential character duplicates in the prompt."""
         # (Keep this method here for debugging prompts)
-        import re
         required_char_names = [char['name'] for char in required_characters]
         all_char_names = [info['name'] for info in self.config.get('characters', {}).values()]
         non_required_chars = [name for name in all_char_names if name not in required_char_names]
@@ -290,17 +482,15 @@ class BookGenerator:
         logger.info(f"Non-Required: {', '.join(non_required_chars)}")
         
         for char_name in required_char_names:
-            char_section_pattern = fr"Character: {re.escape(char_name)}.*?EXACTLY ONCE"
-            char_sections = re.findall(char_section_pattern, prompt, re.IGNORECASE | re.DOTALL)
+            char_sections = _char_section_re(char_name).findall(prompt)
             if len(char_sections) > 1: logger.warning(f"POTENTIAL DUPLICATE: '{char_name}' mentioned {len(char_sections)} times in instructions!")
             if len(char_sections) == 0: logger.warning(f"POTENTIAL ISSUE: '{char_name}' missing 'EXACTLY ONCE' instruction!")
         
         for char_name in non_required_chars:
-            char_req_pattern = fr"{re.escape(char_name)}.*?MUST APPEAR EXACTLY ONCE"
-            if re.search(char_req_pattern, prompt, re.IGNORECASE | re.DOTALL):
+            if _char_req_re(char_name).search(prompt):
                 logger.error(f"NON-REQUIRED CHAR INCLUDED: '{char_name}' in character requirements!")
         
-        total_match = re.search(r"TOTAL CHARACTERS: EXACTLY (\d+)", prompt)
+        total_match = _TOTAL_CHARS_RE.search(prompt)
         if total_match:
             specified_count = int(total_match.group(1))
             if specified_count != len(required_characters):
@@ -310,16 +500,6 @@ class BookGenerator:
 
     def _process_and_save_images(self, image_data_list: Optional[List[str]], page_number: int, text: str) -> Tuple[int, Optional[str]]:
         """Process and save images by calling the external image processor."""
-        image_settings = self.config.get('image_settings', {})
-        # Extract individual settings to pass to the function
-        target_width = image_settings.get('width', 1024)
-        target_height = image_settings.get('height', 1024)
-        image_format = image_settings.get('format', 'RGB')
-        resize_method_name = image_settings.get('resize_method', 'LANCZOS')
-        maintain_aspect = image_settings.get('maintain_aspect_ratio', True)
-        smart_crop = image_settings.get('smart_crop', False)
-        bg_color = image_settings.get('background_color', 'white')
-        
         image_count, first_original_image_path = process_and_save_images(
             image_data_list=image_data_list, 
             page_number=page_number, 
@@ -329,18 +509,15 @@ class BookGenerator:
             # Pass managers
             text_overlay_manager=self.text_overlay_manager,
             checkpoint_manager=self.checkpoint_manager,
-            # Pass individual settings
-            target_width=target_width,
-            target_height=target_height,
-            image_format=image_format,
-            resize_method_name=resize_method_name,
-            maintain_aspect=maintain_aspect,
-            smart_crop=smart_crop,
-            bg_color=bg_color
+            # Pass image settings resolved in __init__
+            **self._image_processing_settings
         )
         if first_original_image_path:
              absolute_path = self.output_dir / first_original_image_path
-             self.original_image_files[page_number] = str(absolute_path)
+             with self._image_files_lock:
+                 self.original_image_files[page_number] = str(absolute_path)
+             # The file may have been rewritten (regeneration), so forget its cached mtime
+             self._ref_mtimes.pop(str(absolute_path), None)
         return image_count, first_original_image_path
 
     def generate_cover(self):
@@ -362,7 +539,7 @@ class BookGenerator:
             reference_image_b64 = None
             if ref_image_path.exists():
                 logger.info(f"Using image from page {ref_page_num} as style reference for the cover.")
-                with open(ref_image_path, "rb") as f: reference_image_b64 = base64.b64encode(f.read()).decode('utf-8')
+                reference_image_b64 = _b64_of(str(ref_image_path), ref_image_path.stat().st_mtime)
             else:
                 logger.warning(f"Reference image not found at {ref_image_path}. Generating cover without style reference.")
 
@@ -380,12 +557,17 @@ class BookGenerator:
             # Save original cover image (using first result)
             cover_original_path = self.output_dir / "cover_original.png"
             try:
-                img_data = base64.b64decode(image_data_list[0])
+                img_data = _b64decode(image_data_list[0])
                 img = Image.open(BytesIO(img_data))
                 if img.size != (self.image_width, self.image_height):
                    logger.warning(f"Resizing generated cover {img.size} to target ({self.image_width}x{self.image_height}).")
-                   img = img.resize((self.image_width, self.image_height), Image.Resampling.LANCZOS)
-                img.save(cover_original_path)
+                   # BICUBIC: the cover is overlaid and re-encoded anyway, and LANCZOS is much slower
+                   img = img.resize((self.image_width, self.image_height), Image.Resampling.BICUBIC)
+                # Encode once; the same bytes also seed the final cover below
+                buffer = BytesIO()
+                img.save(buffer, "PNG")
+                cover_png = buffer.getvalue()
+                cover_original_path.write_bytes(cover_png)
                 logger.info(f"Saved original cover image to {cover_original_path}")
             except Exception as e:
                 logger.error(f"Failed to save original cover image: {e}")
@@ -393,8 +575,7 @@ class BookGenerator:
 
             # Apply text overlay
             cover_final_path = self.output_dir / "cover_final.png"
-            import shutil
-            shutil.copy2(cover_original_path, cover_final_path)
+            cover_final_path.write_bytes(cover_png)
             position = cover_config.get('cover_text_position', 'middle')
             
             self.text_overlay_manager.apply_text_overlay(
@@ -406,8 +587,19 @@ class BookGenerator:
         except Exception as e:
             logger.error(f"Failed to generate cover: {e}")
 
-    def generate_page(self, page_number: int):
-        """Generate a complete page (text and image)."""
+    def _prepare_page(self, page_number: int) -> Tuple[str, dict, List[dict]]:
+        """Generate a page's text and work out its scene requirements and characters."""
+        story_text = self.generate_page_text(page_number)
+        scene_requirements = self.scene_manager.get_scene_requirements(page_number, story_text)
+        required_characters = self.scene_manager.get_required_characters(page_number, story_text)
+        return story_text, scene_requirements, required_characters
+
+    def generate_page(self, page_number: int, prepared: Optional[Future] = None):
+        """Generate a complete page (text and image).
+        
+        `prepared` is an optional future of `_prepare_page(page_number)` that was started
+        ahead of time (during the rate-limit wait after the previous page).
+        """
         # Skip if already completed
         if page_number in self.completed_pages:
             logger.info(f"Skipping page {page_number} (already completed)")
@@ -417,54 +609,137 @@ class BookGenerator:
         self.checkpoint_manager.update_last_attempted_page(page_number)
         
         try:
-            # First generate the text
-            story_text = self.generate_page_text(page_number)
-            
-            # Get scene requirements
-            scene_requirements = self.scene_manager.get_scene_requirements(page_number, story_text)
-            
-            # Get required characters (now from SceneManager)
-            required_characters = self.scene_manager.get_required_characters(page_number, story_text)
+            # First generate the text, scene requirements and required characters (unless already prepared)
+            if prepared is not None:
+                story_text, scene_requirements, required_characters = prepared.result()
+            else:
+                story_text, scene_requirements, required_characters = self._prepare_page(page_number)
             
             # Then generate the image based on the text
             image_path = self.generate_page_image(page_number, story_text, scene_requirements, required_characters)
             
-            if image_path:
-                logger.info(f"Successfully generated page {page_number} with image: {image_path}")
-                # Mark as having images
-                self.pages_with_images.add(page_number)
-            else:
-                logger.warning(f"Page {page_number} was generated but without images")
-            
-            # Mark as completed and update checkpoint
-            self.completed_pages.add(page_number)
-            self.checkpoint_manager.add_completed_page(page_number)
+            self._mark_page_complete(page_number, image_path)
                 
+        except TRANSIENT_ERRORS as e:
+            # Don't let one page that keeps hitting rate limits abort the whole book
+            logger.error(f"Giving up on page {page_number} after retries: {str(e)}")
+            self.failed_pages[page_number] = e
         except Exception as e:
             logger.error(f"Error generating page {page_number}: {str(e)}")
             raise
 
+    def _mark_page_complete(self, page_number: int, image_path: Optional[str]) -> None:
+        """Record a finished page (and whether it got an image) and update checkpoint."""
+        if page_number in self.failed_pages:
+            logger.warning(f"Page {page_number} left incomplete so it is retried on resume")
+            return
+        if image_path:
+            logger.info(f"Successfully generated page {page_number} with image: {image_path}")
+            # Mark as having images
+            self.pages_with_images.add(page_number)
+        else:
+            logger.warning(f"Page {page_number} was generated but without images")
+        
+        # Mark as completed and update checkpoint
+        self.completed_pages.add(page_number)
+        self.checkpoint_manager.add_completed_page(page_number)
+        # Page boundary: write this page's batched checkpoint changes out in one go
+        self.checkpoint_manager.flush()
+
+    async def agenerate_page_text(self, page_number: int) -> str:
+        """Async variant of generate_page_text; the blocking API call runs in a worker thread."""
+        return await asyncio.to_thread(self.generate_page_text, page_number)
+
+    async def _agenerate_page_image(self, semaphore: asyncio.Semaphore, page_number: int, story_text: str) -> None:
+        """Generate one page image under the concurrency limit, then record the page."""
+        async with semaphore:
+            scene_requirements = self.scene_manager.get_scene_requirements(page_number, story_text)
+            required_characters = self.scene_manager.get_required_characters(page_number, story_text)
+            image_path = await asyncio.to_thread(
+                self.generate_page_image, page_number, story_text, scene_requirements, required_characters
+            )
+        # Bookkeeping stays on the event loop thread
+        self._mark_page_complete(page_number, image_path)
+
+    async def agenerate_all_pages(self) -> None:
+        """Generate every remaining page, running independent image generations concurrently.
+        
+        Story text builds on the previous pages' descriptions, so it is generated in order.
+        Images only depend on earlier pages as style references: character introduction
+        pages go first so every later page has its reference, then the rest run together.
+        """
+        total_pages = self.config['book']['page_count']
+        pending = [p for p in range(1, total_pages + 1) if p not in self.completed_pages]
+        semaphore = asyncio.Semaphore(self.page_concurrency)
+        
+        story_texts = {}
+        for page_num in pending:
+            self.last_attempted_page = page_num
+            self.checkpoint_manager.update_last_attempted_page(page_num)
+            try:
+                story_texts[page_num] = await self.agenerate_page_text(page_num)
+            except TRANSIENT_ERRORS as e:
+                logger.error(f"Giving up on page {page_num} after retries: {str(e)}")
+                self.failed_pages[page_num] = e
+        
+        intro_pages = {
+            char.get('introduction', {}).get('page')
+            for char in self.config.get('characters', {}).values()
+        }
+        first_batch = [p for p in story_texts if p in intro_pages]
+        second_batch = [p for p in story_texts if p not in intro_pages]
+        for batch in (first_batch, second_batch):
+            if batch:
+                logger.info(f"Generating images for pages {batch} (up to {self.page_concurrency} at a time)")
+                await asyncio.gather(*(self._agenerate_page_image(semaphore, p, story_texts[p]) for p in batch))
+
+    def reset_transient_state(self):
+        """Forget per-run failures so a retried generate_book() attempts those pages again."""
+        self.failed_pages.clear()
+
     def generate_book(self):
-        """Generate the complete book."""
+        """Generate the complete book.
+        
+        Pages that still fail on transient errors after their retries are left incomplete, and
+        once every other page is done the error is raised (a RateLimitError if any page hit one)
+        so callers such as handle_rate_limit_retry can wait and resume the book.
+        """
         total_pages = self.config['book']['page_count']
         if self.completed_pages:
             logger.info(f"Resuming book generation: {len(self.completed_pages)}/{total_pages} pages already completed")
         else:
             logger.info("Starting book generation...")
         
+        # One background worker prepares the next page while we wait out the rate-limit delay
+        prep_executor = ThreadPoolExecutor(max_workers=1)
         try:
-            for page_num in range(1, total_pages + 1):
-                if page_num in self.completed_pages:
-                    logger.info(f"Page {page_num} already completed, skipping")
-                    continue
+            if self.page_concurrency > 1:
+                # Concurrency is bounded by the semaphore; 429s are retried per call with backoff
+                asyncio.run(self.agenerate_all_pages())
+            else:
+                prepared = None
+                for page_num in range(1, total_pages + 1):
+                    if page_num in self.completed_pages:
+                        logger.info(f"Page {page_num} already completed, skipping")
+                        continue
+                        
+                    logger.info(f"Generating page {page_num}...")
+                    self.generate_page(page_num, prepared=prepared)
+                    prepared = None
                     
-                logger.info(f"Generating page {page_num}...")
-                self.generate_page(page_num)
-                
-                # Add delay between pages to avoid rate limits
-                if page_num < total_pages:
-                    logger.info(f"Waiting 8 seconds before next page...")
-                    time.sleep(8)  # Increased delay to further reduce rate limit issues
+                    # Add delay between pages to avoid rate limits
+                    if page_num < total_pages:
+                        next_page = next((p for p in range(page_num + 1, total_pages + 1) if p not in self.completed_pages), None)
+                        if next_page is not None:
+                            prepared = prep_executor.submit(self._prepare_page, next_page)
+                        logger.info(f"Waiting 8 seconds before next page...")
+                        time.sleep(8)  # Increased delay to further reduce rate limit issues
+            
+            if self.failed_pages:
+                # The book is incomplete; skip assembly until a resumed run fills the gaps
+                logger.warning(f"Pages {sorted(self.failed_pages)} failed after retries; rerun to resume them")
+                errors = list(self.failed_pages.values())
+                raise next((e for e in errors if isinstance(e, RateLimitError)), errors[-1])
             
             logger.info("Book generation completed!")
 
@@ -485,6 +760,8 @@ class BookGenerator:
             logger.error(f"Book generation interrupted: {str(e)}")
             logger.info(f"You can resume generation later from the last checkpoint")
             raise
+        finally:
+            prep_executor.shutdown(wait=True)
     
     def _create_final_book(self):
         """Create a final book file with consistent layout."""
@@ -525,15 +802,17 @@ class BookGenerator:
         # original_existing_characters = self.scene_manager.existing_characters.copy()
         original_image_files = self.original_image_files.copy()
         
+        # One background worker prepares the next page while we wait out the rate-limit delay
+        prep_executor = ThreadPoolExecutor(max_workers=1)
         try:
-            # Remove pages from completed_pages to force regeneration
-            for page_num in page_numbers:
-                if page_num in self.completed_pages:
-                    self.completed_pages.remove(page_num)
-                    logger.info(f"Removed page {page_num} from completed pages for regeneration")
-            
-            # Process pages in sequence to maintain the flow
-            for page_num in page_numbers:
+            # Remove pages from completed_pages to force regeneration (one set operation)
+            if removed_pages := [page_num for page_num in page_numbers if page_num in self.completed_pages]:
+                self.completed_pages.difference_update(removed_pages)
+                logger.info(f"Removed pages {removed_pages} from completed pages for regeneration")
+            
+            # Process pages in sequence to maintain the flow; the next page is prepared during the wait
+            prepared = None
+            for i, page_num in enumerate(page_numbers):
                 logger.info(f"Regenerating page {page_num}")
                 
                 # --- Use SceneManager to find reference page --- #
@@ -542,12 +821,10 @@ class BookGenerator:
                 
                 # Fallback strategy if needed (this might be redundant now? Check SceneManager logic)
                 if best_ref_page is None and page_num > 1:
-                    # Try to find the closest preceding page with a saved image
-                    for prev_page in range(page_num-1, 0, -1):
-                        if prev_page in self.original_image_files:
-                           best_ref_page = prev_page
-                           logger.info(f"Found fallback reference page {best_ref_page} for regeneration (closest previous)")
-                           break
+                    # Try to find the closest preceding page with a saved image (one pass over the saved pages)
+                    best_ref_page = max((p for p in self.original_image_files if p < page_num), default=None)
+                    if best_ref_page is not None:
+                        logger.info(f"Found fallback reference page {best_ref_page} for regeneration (closest previous)")
                 # --- End reference finding --- #
                 
                 # Temporarily ensure reference page info exists if needed
@@ -568,13 +845,15 @@ class BookGenerator:
                 # self.is_regenerating = True 
                 
                 # Generate the page (will use the logic updated above)
-                self.generate_page(page_num)
+                self.generate_page(page_num, prepared=prepared)
+                prepared = None
                 
                 # Clear the regeneration flag
                 # self.is_regenerating = False
                 
                 # Add delay between pages to avoid rate limits
                 if page_num != page_numbers[-1]:
+                    prepared = prep_executor.submit(self._prepare_page, page_numbers[i + 1])
                     logger.info(f"Waiting 8 seconds before next page...")
                     time.sleep(8)
                     
@@ -596,6 +875,8 @@ class BookGenerator:
             # self.scene_manager.existing_characters = original_existing_characters
             self.original_image_files = original_image_files
             raise
+        finally:
+            prep_executor.shutdown(wait=True)
 
     def _generate_style_requirements(self, scene_requirements: dict) -> str:
         style_parts = []
@@ -645,8 +926,14 @@ class BookGenerator:
             logger.error(f"Error generating backup story for page {page_number}: {str(e)}")
             return None
 
+# Upper bound (seconds) on the whole-book retry wait, however many times it has doubled
+_MAX_RETRY_WAIT = 600
+
 def handle_rate_limit_retry(max_retries=3, initial_wait=20):
-    """Try to resume book generation with exponential backoff for rate limits."""
+    """Try to resume book generation with jittered exponential backoff for rate limits.
+    
+    A Retry-After value carried by a RateLimitError is honored instead of the computed wait.
+    """
     retry_count = 0
     wait_time = initial_wait
     config_path = "config.yaml" # Define config path here
@@ -658,76 +945,92 @@ def handle_rate_limit_retry(max_retries=3, initial_wait=20):
         logger.error(f"Failed to load configuration {config_path} for retry logic: {e}")
         return # Cannot proceed without config
 
-    while retry_count < max_retries:
-        try:
-            # Instantiate managers
-            api_client = APIClient(config.get('generation', {}))
-            checkpoint_manager = CheckpointManager()
-            text_overlay_manager = TextOverlayManager(Path("assets/fonts"), config.get('image_settings', {}), config.get('cover', {}))
-            # Instantiate TransitionManager first as SceneManager needs it
-            transition_manager = TransitionManager(
-                settings=config.get('settings', {}),
-                environment_types=config.get('environment_types', {}),
-                transition_rules=config.get('transition_rules', {}),
-                environment_transitions=config.get('environment_transitions', {}),
-                page_emotions=config.get('page_emotions', {}),
-                story_progression=config.get('story_progression', {})
-            )
-            # Instantiate SceneManager with specific config sections and TransitionManager
-            scene_manager = SceneManager(
-                settings=config.get('settings', {}),
-                characters=config.get('characters', {}),
-                story_progression=config.get('story_progression', {}),
-                page_emotions=config.get('page_emotions', {}),
-                environment_types=config.get('environment_types', {}),
-                scene_management=config.get('scene_management', {}),
-                story_beats=config.get('story', {}).get('story_beats', {}),
-                transition_manager=transition_manager
-            )
-            # Instantiate PromptManager with SceneManager, TransitionManager and specific config sections
-            prompt_manager = PromptManager(
-                book_config=config.get('book', {}),
-                characters_config=config.get('characters', {}),
-                generation_config=config.get('generation', {}),
-                image_settings=config.get('image_settings', {}),
-                cover_config=config.get('cover', {}),
-                metadata_config=config.get('metadata', {}),
-                scene_manager=scene_manager,
-                transition_manager=transition_manager # Pass transition_manager
-            )
+    # The generator and its managers (and the scene/prompt caches they build up) are shared by every attempt;
+    # pages finished before a rate limit stay in its completed set and checkpoint, so a retry resumes after them
+    try:
+        text_overlay_manager = TextOverlayManager(Path("assets/fonts"), config.get('image_settings', {}), config.get('cover', {}))
+        # Instantiate TransitionManager first as SceneManager needs it
+        transition_manager = TransitionManager(
+            settings=config.get('settings', {}),
+            environment_types=config.get('environment_types', {}),
+            transition_rules=config.get('transition_rules', {}),
+            environment_transitions=config.get('environment_transitions', {}),
+            page_emotions=config.get('page_emotions', {}),
+            story_progression=config.get('story_progression', {})
+        )
+        # Instantiate SceneManager with specific config sections and TransitionManager
+        scene_manager = SceneManager(
+            settings=config.get('settings', {}),
+            characters=config.get('characters', {}),
+            story_progression=config.get('story_progression', {}),
+            page_emotions=config.get('page_emotions', {}),
+            environment_types=config.get('environment_types', {}),
+            scene_management=config.get('scene_management', {}),
+            story_beats=config.get('story', {}).get('story_beats', {}),
+            transition_manager=transition_manager
+        )
+        # Instantiate PromptManager with SceneManager, TransitionManager and specific config sections
+        prompt_manager = PromptManager(
+            book_config=config.get('book', {}),
+            characters_config=config.get('characters', {}),
+            generation_config=config.get('generation', {}),
+            image_settings=config.get('image_settings', {}),
+            cover_config=config.get('cover', {}),
+            metadata_config=config.get('metadata', {}),
+            scene_manager=scene_manager,
+            transition_manager=transition_manager # Pass transition_manager
+        )
+        api_client = APIClient(config.get('generation', {}))
+        checkpoint_manager = CheckpointManager()
 
-            # Instantiate BookGenerator with injected managers
-            generator = BookGenerator(
-                config_path=config_path, 
-                api_client=api_client,
-                checkpoint_manager=checkpoint_manager,
-                text_overlay_manager=text_overlay_manager,
-                scene_manager=scene_manager,
-                transition_manager=transition_manager,
-                prompt_manager=prompt_manager
-            )
-            # Scene manager needs previous descriptions set after generator init loads checkpoint
-            # This happens inside BookGenerator.__init__ now
+        # Instantiate BookGenerator with injected managers
+        generator = BookGenerator(
+            config_path=config_path, 
+            api_client=api_client,
+            checkpoint_manager=checkpoint_manager,
+            text_overlay_manager=text_overlay_manager,
+            scene_manager=scene_manager,
+            transition_manager=transition_manager,
+            prompt_manager=prompt_manager
+        )
+        # Scene manager needs previous descriptions set after generator init loads checkpoint
+        # This happens inside BookGenerator.__init__ now
+    except Exception as e:
+        logger.error(f"Failed to set up book generator for retry logic: {e}")
+        return
 
-            generator.generate_book()
-            # If successful, exit the loop
-            break
-        except Exception as e:
-            error_str = str(e).lower()
-            if "rate limit" in error_str or "quota" in error_str:
-                retry_count += 1
-                if retry_count >= max_retries:
-                    logger.error(f"Maximum retries ({max_retries}) exceeded. Giving up.")
-                    break
-                    
-                logger.warning(f"Rate limit hit. Waiting {wait_time} seconds before retry {retry_count}/{max_retries}...")
-                time.sleep(wait_time)
-                # Exponential backoff - double the wait time for next attempt
-                wait_time *= 2
-            else:
-                # If it's not a rate limit error, don't retry
-                logger.error(f"Error not related to rate limits: {str(e)}")
+    try:
+        while retry_count < max_retries:
+            try:
+                generator.generate_book()
+                # If successful, exit the loop
                 break
+            except Exception as e:
+                error_str = str(e).lower()
+                if isinstance(e, RateLimitError) or "rate limit" in error_str or "quota" in error_str:
+                    retry_count += 1
+                    if retry_count >= max_retries:
+                        logger.error(f"Maximum retries ({max_retries}) exceeded. Giving up.")
+                        break
+
+                    if isinstance(e, RateLimitError) and e.retry_after is not None:
+                        actual_wait = e.retry_after
+                    else:
+                        # Jitter within [wait/2, wait] so parallel runs sharing a key don't retry in lockstep
+                        actual_wait = random.uniform(wait_time * 0.5, wait_time)
+                    logger.warning(f"Rate limit hit. Waiting {actual_wait:.1f} seconds before retry {retry_count}/{max_retries}...")
+                    time.sleep(actual_wait)
+                    generator.reset_transient_state()
+                    # Exponential backoff - double the wait time for next attempt, up to the cap
+                    wait_time = min(wait_time * 2, _MAX_RETRY_WAIT)
+                else:
+                    # If it's not a rate limit error, don't retry
+                    logger.error(f"Error not related to rate limits: {str(e)}")
+                    break
+    finally:
+        generator.close()
+        api_client.close()
+        checkpoint_manager.close()
 
 def main():
     """Main entry point for the book generation script."""
@@ -750,6 +1053,13 @@ def main():
     parser.add_argument('--apply-text', type=str, nargs='*', help='Apply text overlay to existing images. Optional arguments: [position] [page_num|cover]. Position: top, middle, bottom (default: bottom). Target: specific page number, "cover", or blank for all pages.')
     args = parser.parse_args()
     
+    if args.retry and not args.apply_text:
+        # The retry loop builds (and closes) its own managers and generator on the checkpoint;
+        # building another set here would load the same checkpoint file twice
+        logger.info("Starting with auto-retry for rate limits")
+        handle_rate_limit_retry()
+        return
+    
     # Instantiate managers before BookGenerator
     api_client = APIClient(config.get('generation', {}))
     checkpoint_manager = CheckpointManager()
@@ -799,6 +1109,15 @@ def main():
     # Scene manager needs previous descriptions set after generator init loads checkpoint
     # This happens inside BookGenerator.__init__ now
     
+    try:
+        _run_command(args, generator)
+    finally:
+        generator.close()
+        api_client.close()
+        checkpoint_manager.close()
+
+def _run_command(args: argparse.Namespace, generator: BookGenerator) -> None:
+    """Run the action chosen on the command line with a ready generator."""
     if args.apply_text:
         # Parse text placement options
         position = "bottom"  # default position
@@ -828,7 +1147,6 @@ def main():
                 cover_text = f"{title}\n{author}"
 
                 # Copy original to final path first
-                import shutil
                 shutil.copy2(cover_original_path, cover_final_path)
                 
                 # Apply overlay using cover style
@@ -861,7 +1179,19 @@ def main():
         logger.info(f"Applying text to pages" + (f" (specifically page {target_page_num})" if target_page_num is not None else " (all pages)"))
 
         # Find all existing page directories in the generator's output dir
-        for page_dir in sorted(generator.output_dir.glob("page_*")):
+        page_dirs = sorted(generator.output_dir.glob("page_*"))
+        
+        # When applying to all pages, list every page directory and read its story text up front
+        # in parallel so the overlay loop doesn't wait on one small file read at a time
+        story_executor = None
+        story_futures = {}
+        if target_page_num is None and page_dirs:
+            story_executor = ThreadPoolExecutor(max_workers=16)
+            story_futures = {page_dir: story_executor.submit(_read_page_overlay_inputs, page_dir) for page_dir in page_dirs}
+        
+        # Pages ready for an overlay: (original image, page dir, page number, story text)
+        overlay_jobs = []
+        for page_dir in page_dirs:
             try:
                 # Extract page number from directory name
                 page_num = int(page_dir.name.split('_')[1])
@@ -870,75 +1200,80 @@ def main():
                 if target_page_num is not None and page_num != target_page_num:
                     continue
                 
+                # Check the original image and read the story text (prefetched when applying to all pages)
+                story_future = story_futures.get(page_dir)
+                has_original, story_text = story_future.result() if story_future else _read_page_overlay_inputs(page_dir)
+                
                 # Check if original image exists
                 original_image = page_dir / "image_original_1.png"
-                if not original_image.exists():
+                if not has_original:
                     logger.warning(f"Original image not found for page {page_num}, skipping")
                     continue
                 
-                # Check if story text exists
-                story_text_file = page_dir / "story_text.txt"
-                if not story_text_file.exists():
+                if story_text is None:
                     logger.warning(f"Story text not found for page {page_num}, skipping")
                     continue
                 
-                # Read the story text
-                with open(story_text_file, 'r') as f:
-                    story_text = f.read().strip()
-                
-                logger.info(f"Applying text overlay to page {page_num} at {position}")
-                
-                # Copy original image to both locations before applying overlay
-                image_with_text = page_dir / "image_1.png"
-                processed_dir = page_dir.parent / "processed_book"
-                processed_file = processed_dir / f"page_{page_num:02d}.png"
-                
-                # Ensure processed directory exists
-                processed_dir.mkdir(exist_ok=True)
-                
-                # Copy original image to both locations
-                import shutil
-                shutil.copy2(original_image, image_with_text)
-                shutil.copy2(original_image, processed_file)
-                
-                # Apply text overlay to both copies
-                generator.text_overlay_manager.apply_text_overlay(image_with_text, story_text, page_num, position=position)
-                generator.text_overlay_manager.apply_text_overlay(processed_file, story_text, page_num, is_final=True, position=position)
+                overlay_jobs.append((original_image, page_dir, page_num, story_text))
                 
             except Exception as e:
                 logger.error(f"Error processing page {page_dir.name}: {str(e)}")
                 continue
         
+        if story_executor:
+            story_executor.shutdown()
+        
+        if overlay_jobs:
+            # Ensure processed directory exists
+            (generator.output_dir / "processed_book").mkdir(exist_ok=True)
+        
+        if len(overlay_jobs) > 1:
+            # The overlays are CPU-bound PIL work and independent per page, so spread them over processes
+            with ProcessPoolExecutor(max_workers=min(len(overlay_jobs), os.cpu_count() or 1),
+                                     initializer=_init_overlay_worker,
+                                     initargs=(generator.text_overlay_manager,)) as pool:
+                overlay_futures = []
+                for original_image, page_dir, page_num, story_text in overlay_jobs:
+                    logger.info(f"Applying text overlay to page {page_num} at {position}")
+                    overlay_futures.append((page_dir, pool.submit(_overlay_page_in_worker, original_image, page_dir, page_num, story_text, position)))
+                # A page that fails doesn't stop the others
+                for page_dir, future in overlay_futures:
+                    if (e := future.exception()) is not None:
+                        logger.error(f"Error processing page {page_dir.name}: {str(e)}")
+        else:
+            for original_image, page_dir, page_num, story_text in overlay_jobs:
+                try:
+                    logger.info(f"Applying text overlay to page {page_num} at {position}")
+                    _overlay_page(generator.text_overlay_manager, original_image, page_dir, page_num, story_text, position)
+                except Exception as e:
+                    logger.error(f"Error processing page {page_dir.name}: {str(e)}")
+        
         logger.info("Finished applying text overlays to pages.")
         return # Exit after processing pages
     
     # --- Regular Generation Flow (If no special flags) --- #
-    if args.retry:
-        logger.info("Starting with auto-retry for rate limits")
-        handle_rate_limit_retry()
-    else:
-        try:
-            if args.regenerate:
-                # Handle cover regeneration separately
-                if args.regenerate.strip().lower() == 'cover':
-                    logger.info("Regenerating cover...")
-                    generator.generate_cover()
-                    logger.info("Cover regeneration complete.")
-                else:
-                    # Convert comma-separated string to list of integers for page numbers
-                    try:
-                        pages_to_regenerate = [int(x.strip()) for x in args.regenerate.split(',')]
-                        generator.regenerate_pages(pages_to_regenerate)
-                    except ValueError:
-                         logger.error(f"Invalid page number found in --regenerate argument: {args.regenerate}. Please provide comma-separated page numbers or 'cover'.")
-                         raise # Re-raise the error to stop execution gracefully
+    try:
+        if args.regenerate:
+            # Handle cover regeneration separately
+            if args.regenerate.strip().lower() == 'cover':
+                logger.info("Regenerating cover...")
+                generator.generate_cover()
+                logger.info("Cover regeneration complete.")
             else:
-                generator.generate_book()
-        except Exception as e:
-            logger.error(f"Failed to generate book: {str(e)}")
-            logger.info("Tip: Run with --retry flag to automatically retry after rate limits")
-            logger.info("Tip: Run with --regenerate 1,2,3 to regenerate specific pages")
-            logger.info("Tip: Run with --apply-text to only apply text overlay to existing images")
+                # Convert comma-separated string to list of integers for page numbers
+                try:
+                    pages_to_regenerate = [int(x.strip()) for x in args.regenerate.split(',')]
+                    generator.regenerate_pages(pages_to_regenerate)
+                except ValueError:
+                     logger.error(f"Invalid page number found in --regenerate argument: {args.regenerate}. Please provide comma-separated page numbers or 'cover'.")
+                     raise # Re-raise the error to stop execution gracefully
+        else:
+            generator.generate_book()
+    except Exception as e:
+        logger.error(f"Failed to generate book: {str(e)}")
+        logger.info("Tip: Run with --retry flag to automatically retry after rate limits")
+        logger.info("Tip: Run with --regenerate 1,2,3 to regenerate specific pages")
+        logger.info("Tip: Run with --apply-text to only apply text overlay to existing images")
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
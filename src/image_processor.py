@@ -1,15 +1,75 @@
-import base64
 import os
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
 from pathlib import Path
 from typing import Optional, List, Dict, Tuple
 
-from PIL import Image
+from PIL import Image, ImageOps
 from loguru import logger
 
 from .text_overlay_manager import TextOverlayManager # Assuming TextOverlayManager is in the same directory
 from .checkpoint_manager import CheckpointManager # Assuming CheckpointManager is in the same directory
 
+# Prefer pybase64's SIMD decoder for the multi-megabyte image payloads when it is installed
+try:
+    from pybase64 import b64decode as _b64decode
+except ImportError:
+    from base64 import b64decode as _b64decode
+
+def _write_file(path: Path, data: bytes) -> None:
+    """Write bytes to a file with raw os calls, skipping the buffered file object."""
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+    try:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
+
+def _render_png(
+    image_data_base64: str,
+    target_width: int,
+    target_height: int,
+    image_format: str,
+    resize_method: int,
+    maintain_aspect: bool,
+    smart_crop: bool,
+    bg_color: str,
+    compress_level: int,
+    label: str
+) -> bytes:
+    """Decode one base64 image, fit it to the target size and return it encoded as PNG."""
+    # Decode base64 image
+    image_data = _b64decode(image_data_base64)
+
+    # Open and process image
+    img = Image.open(BytesIO(image_data))
+    logger.debug(f"Loaded {label}: format={img.format}, mode={img.mode}, size={img.size}")
+
+    # For JPEGs well above the target size, let libjpeg decode at a reduced DCT scale
+    # (never below twice the target); draft is a no-op for other formats such as PNG
+    img.draft(image_format, (target_width * 2, target_height * 2))
+
+    # Convert to RGB if needed
+    if img.mode != image_format:
+        img = img.convert(image_format)
+
+    # Calculate dimensions while maintaining aspect ratio if required
+    if maintain_aspect and not smart_crop:
+        # Letterbox: scale to fit within the target and center on a background
+        final_img = ImageOps.pad(img, (target_width, target_height), method=resize_method, color=bg_color, centering=(0.5, 0.5))
+    elif maintain_aspect and smart_crop:
+        # Smart crop: scale to fill the target and crop the centered excess
+        # (fit resizes only the region that is kept, rather than the whole oversized image)
+        final_img = ImageOps.fit(img, (target_width, target_height), method=resize_method, centering=(0.5, 0.5))
+    else:
+        # Direct resize to target dimensions
+        final_img = img.resize((target_width, target_height), resize_method)
+
+    buffer = BytesIO()
+    final_img.save(buffer, "PNG", optimize=False, compress_level=compress_level)
+    return buffer.getvalue()
+
 def process_and_save_images(
     image_data_list: Optional[List[str]],
     page_number: int,
@@ -26,7 +86,8 @@ def process_and_save_images(
     resize_method_name: str = 'LANCZOS',
     maintain_aspect: bool = True,
     smart_crop: bool = False,
-    bg_color: str = 'white'
+    bg_color: str = 'white',
+    compress_level: int = 6
 ) -> Tuple[int, Optional[str]]:
     """
     Processes and saves images from a list of base64 encoded strings.
@@ -48,6 +109,7 @@ def process_and_save_images(
         maintain_aspect: Whether to maintain aspect ratio (letterboxing).
         smart_crop: Whether to crop to fill dimensions if maintain_aspect is True.
         bg_color: Background color for letterboxing.
+        compress_level: zlib level (0-9) for the saved PNGs; lower is faster but larger.
         text_overlay_manager: Instance of TextOverlayManager.
         checkpoint_manager: Instance of CheckpointManager.
 
@@ -83,86 +145,48 @@ def process_and_save_images(
     # smart_crop = image_settings.get('smart_crop', False)
     # bg_color = image_settings.get('background_color', 'white')
 
+    jobs = []
     for idx, image_data_base64 in enumerate(image_data_list, 1):
         if not image_data_base64 or len(image_data_base64) < 100: # Basic check
             logger.warning(f"Skipping invalid or empty image data string for image {idx} on page {page_number}.")
             continue
+        jobs.append((idx, image_data_base64))
+
+    def render(job: Tuple[int, str]) -> Optional[bytes]:
+        idx, image_data_base64 = job
+        try:
+            return _render_png(
+                image_data_base64, target_width, target_height, image_format,
+                resize_method, maintain_aspect, smart_crop, bg_color, compress_level,
+                label=f"image {idx} for page {page_number}"
+            )
+        except Exception as e:
+            logger.error(f"Error processing image {idx} for page {page_number}: {str(e)}")
+            return None
+
+    # Decode/resize/encode is mostly PIL C code that releases the GIL, so several images render in parallel
+    if len(jobs) > 1:
+        with ThreadPoolExecutor(max_workers=min(len(jobs), os.cpu_count() or 1)) as executor:
+            rendered = list(executor.map(render, jobs))
+    else:
+        rendered = [render(job) for job in jobs]
+
+    processed_dir.mkdir(exist_ok=True) # Ensure processed dir exists (once per page, not per image)
+    for (idx, _), png_data in zip(jobs, rendered):
+        if png_data is None:
+            continue
 
         try:
-            # Decode base64 image
-            image_data = base64.b64decode(image_data_base64)
-
-            # Open and process image
-            img = Image.open(BytesIO(image_data))
-            logger.debug(f"Loaded image {idx} for page {page_number}: format={img.format}, mode={img.mode}, size={img.size}")
-
-            # Convert to RGB if needed
-            if img.mode != image_format:
-                img = img.convert(image_format)
-
-            # Calculate dimensions while maintaining aspect ratio if required
-            if maintain_aspect and not smart_crop:
-                # Create a blank background image
-                background = Image.new(image_format, (target_width, target_height), bg_color)
-
-                # Calculate scaling factor to fit within target dimensions
-                width_ratio = target_width / img.width if img.width > 0 else 1
-                height_ratio = target_height / img.height if img.height > 0 else 1
-                scale_factor = min(width_ratio, height_ratio)
-
-                # Calculate new dimensions
-                new_width = int(img.width * scale_factor)
-                new_height = int(img.height * scale_factor)
-
-                # Resize image
-                img_resized = img.resize((new_width, new_height), resize_method)
-
-                # Calculate position to center the image
-                x = (target_width - new_width) // 2
-                y = (target_height - new_height) // 2
-
-                # Paste resized image onto background
-                background.paste(img_resized, (x, y))
-                final_img = background
-            elif maintain_aspect and smart_crop:
-                # Smart crop: resize to fill the canvas completely and crop excess
-                width_ratio = target_width / img.width if img.width > 0 else 1
-                height_ratio = target_height / img.height if img.height > 0 else 1
-
-                # Use the larger ratio to ensure the image fills the target dimensions
-                scale_factor = max(width_ratio, height_ratio)
-
-                # Calculate new dimensions (larger than target dimensions)
-                new_width = int(img.width * scale_factor)
-                new_height = int(img.height * scale_factor)
-
-                # Resize image (to larger than target dimensions)
-                img_resized = img.resize((new_width, new_height), resize_method)
-
-                # Calculate crop box to center the image
-                left = (new_width - target_width) // 2
-                top = (new_height - target_height) // 2
-                right = left + target_width
-                bottom = top + target_height
-
-                # Crop the image to the target dimensions
-                final_img = img_resized.crop((left, top, right, bottom))
-            else:
-                # Direct resize to target dimensions
-                final_img = img.resize((target_width, target_height), resize_method)
-
-            # Save original image without text
+            # Save original image without text, a copy for text overlay, and a copy in the
+            # processed directory; the PNG is encoded once and the same bytes written to each
             original_image_path = page_dir / f"image_original_{idx}.png"
-            final_img.save(original_image_path, "PNG")
+            _write_file(original_image_path, png_data)
 
-            # Save copies for text overlay
             image_with_text_path = page_dir / f"image_{idx}.png"
-            final_img.save(image_with_text_path, "PNG")
+            _write_file(image_with_text_path, png_data)
 
-            # Save a copy in the processed directory
-            processed_dir.mkdir(exist_ok=True) # Ensure processed dir exists
             processed_image_path = processed_dir / f"page_{page_number:02d}.png"
-            final_img.save(processed_image_path, "PNG")
+            _write_file(processed_image_path, png_data)
 
             # Store original image file path (only store the first generated image for reference)
             if image_count == 0:
@@ -1,12 +1,32 @@
 from loguru import logger
 from typing import List, Dict, Optional, Tuple
-import base64
+import functools
+import io
 import os
 
 # Assuming SceneManager and TransitionManager are appropriately imported or defined
 from .scene_manager import SceneManager 
 from .transition_manager import TransitionManager
 
+# Added to the text consistency rules once there is previous context to follow on from
+_NARRATIVE_FLOW_RULE = "- **Narrative Flow:** Ensure the text flows logically from previous events."
+
+# Character attributes used as appearance rules when the scene defines none, with their labels
+_APPEARANCE_ATTRS = (('appearance', 'Appearance'), ('outfit', 'Outfit'), ('features', 'Features'))
+
+# Visual details listed in an image prompt's scene analysis, in order, with their labels
+_VISUAL_DETAILS = tuple((key, key.replace('_', ' ').title()) for key in ('emotion', 'lighting', 'mood', 'visual_focus', 'color_palette'))
+_VISUAL_KEYS = frozenset(key for key, _ in _VISUAL_DETAILS)
+
+# Reference handling keys, in prompt order, with their guidance labels
+_REFERENCE_GUIDANCE_LABELS = (('maintain', 'Maintain'), ('adapt', 'Adapt'), ('ignore', 'Ignore'))
+
+# Follows the reference image guidance in an image prompt
+_REFERENCE_CONSISTENCY_NOTE = "\n**CRITICAL CONSISTENCY NOTE:** Use text rules (marked 'ALWAYS') as primary source for appearance. Use reference image mainly for style, palette, placement. TEXT RULES OVERRIDE IMAGE CONFLICTS."
+
+# Closing reminder of the anti-duplication rules
+_ANTIDUP_WARNING = "\nWARNING: DUPLICATING CHARACTERS IS THE MOST COMMON ERROR.\nCAREFULLY CHECK YOUR SCENE AND REMOVE ANY DUPLICATE CHARACTERS."
+
 class PromptManager:
     """Manages the generation of prompts for text and image generation."""
 
@@ -31,63 +51,108 @@ class PromptManager:
         # Store injected managers
         self.scene_manager = scene_manager
         self.transition_manager = transition_manager # Store transition manager
+        
+        # Character name -> config entry (the first entry wins if two share a name)
+        self._character_by_name = {}
+        for info in self.characters_config.values():
+            if (name := info.get('name')) is not None:
+                self._character_by_name.setdefault(name, info)
+        
+        # Text prompt sections that only depend on config, joined once up front
+        self._book_details_block = "\n".join(self._build_book_details())
+        self._characters_block = "\n".join(self._build_character_summary())
+        self._generation_guidance_block = "\n".join(self._build_text_generation_guidance())
+        self._consistency_rules_block = "\n".join(self._build_text_consistency_rules())
+        self._text_instructions_block = "\n".join(self._build_text_instructions())
+        
+        # Anti-duplication sections that don't depend on the page's characters
+        rules_config = self.generation_config.get('anti_duplication_rules', {})
+        self._antidup_rule_templates = rules_config.get('rules', [])
+        self._antidup_verification_templates = rules_config.get('verification_rules', [])
+        self._antidup_consistency_block = self._format_rule_section("\nCONSISTENCY REQUIREMENTS:", rules_config.get('consistency_rules', []))
+        self._antidup_flexibility_block = self._format_rule_section("\nALLOWED VARIATIONS:", rules_config.get('flexibility_rules', []))
+        
+        # Image prompt sections that only depend on config
+        self._generation_steps_block = self._get_generation_steps()
+        self._art_style_block = "\n".join(self._get_art_style_guidance())
+        
+        # Memoized per instance: an lru_cache on the methods themselves would key on self and
+        # keep every PromptManager (and its cached prompts) alive for the life of the process
+        self._build_text_prompt = functools.lru_cache(maxsize=128)(self._build_text_prompt)
+        self._format_consistency_context = functools.lru_cache(maxsize=128)(self._format_consistency_context)
+        self._antidup_count_blocks = functools.lru_cache(maxsize=16)(self._antidup_count_blocks)
 
     # --- Text Prompt Generation --- #
 
     def generate_text_prompt(self, page_number: int, previous_descriptions: Dict[int, str]) -> str:
         """Generate a prompt for the text generation model (e.g., for Gemini)."""
+        return self._build_text_prompt(page_number, self._context_window(page_number, previous_descriptions))
+
+    @staticmethod
+    def _context_window(page_number: int, previous_descriptions: Dict[int, str]) -> Tuple[Tuple[int, str], ...]:
+        """The previous page descriptions (up to 5) that feed a page's consistency context."""
+        return tuple(
+            (prev_page, previous_descriptions[prev_page])
+            for prev_page in range(max(1, page_number - 5), page_number)
+            if prev_page in previous_descriptions
+        )
+
+    # The window holds the description text itself, so a cached prompt is reused only
+    # while the descriptions it was built from are unchanged; no explicit invalidation needed
+    def _build_text_prompt(self, page_number: int, context_window: Tuple[Tuple[int, str], ...]) -> str:
+        """Build (and memoize) the text prompt for a page and its consistency window."""
         
         # Get consistency context using previous descriptions
-        consistency_context = self._get_consistency_context(page_number, previous_descriptions)
+        consistency_context = self._format_consistency_context(context_window)
         
         # Get scene requirements from scene_manager
         # Note: Passing None for content_text as we are generating text, not image
         scene_requirements = self.scene_manager.get_scene_requirements(page_number, None) 
         
-        # Build consistency rules from config
-        consistency_rules = self._build_text_consistency_rules(consistency_context)
-        
-        # Build text instructions from config
-        text_instructions = self._build_text_instructions()
-        
         # Add final page instructions if needed
         final_instructions = self._build_final_page_instructions(page_number)
         
-        # Build the complete prompt dynamically
-        prompt_parts = [
-            f"Create a children's book page with text for page {page_number} of \"{self.book_config.get('title', 'Untitled Book')}\".",
-            ""
-        ]
+        # Write the prompt sections straight into one buffer (sections are separated by blank lines)
+        buf = io.StringIO()
+        w = buf.write
+        w(f"Create a children's book page with text for page {page_number} of \"{self.book_config.get('title', 'Untitled Book')}\".\n\n")
         
-        # Add book details
-        prompt_parts.extend(self._build_book_details())
-        
-        # Add character information
-        prompt_parts.extend(self._build_character_summary())
+        # Add book details and character information
+        w(self._book_details_block)
+        w("\n")
+        w(self._characters_block)
         
         # Add scene requirements
-        prompt_parts.extend(self._build_scene_summary(scene_requirements))
-        
-        # Add remaining sections
-        prompt_parts.extend([
-            "\nPrevious Context (for consistency):",
-            consistency_context,
-            "",
-            *consistency_rules,
-            "",
-            *text_instructions
-        ])
+        self._write_scene_summary(w, scene_requirements)
+        
+        # Add previous context, consistency rules (plus a flow reminder once there is context) and instructions
+        w("\n\nPrevious Context (for consistency):\n")
+        w(consistency_context)
+        w("\n\n")
+        w(self._consistency_rules_block)
+        if consistency_context and "No previous context" not in consistency_context:
+            w("\n")
+            w(_NARRATIVE_FLOW_RULE)
+        w("\n\n")
+        w(self._text_instructions_block)
         
         if final_instructions:
-            prompt_parts.extend(["", *final_instructions])
+            w("\n\n")
+            w("\n".join(final_instructions))
         
         # Add generation instructions from config
-        prompt_parts.extend(self._build_text_generation_guidance())
+        if self._generation_guidance_block:
+            w("\n")
+            w(self._generation_guidance_block)
         
-        return "\n".join(prompt_parts)
+        return buf.getvalue()
 
     def _get_consistency_context(self, page_number: int, previous_descriptions: Dict[int, str]) -> str:
         """Generate context from previous pages for consistency."""
+        return self._format_consistency_context(self._context_window(page_number, previous_descriptions))
+
+    def _format_consistency_context(self, context_window: Tuple[Tuple[int, str], ...]) -> str:
+        """Format (and memoize) the consistency context for a window of previous descriptions."""
         context = []
         
         # Add character descriptions from config for initial context
@@ -97,15 +162,12 @@ class PromptManager:
             context.append(f"{name} ({desc})")
         
         # Add previous page descriptions for continuity (up to 5 previous)
-        prev_pages = range(max(1, page_number - 5), page_number)
-        for prev_page in prev_pages:
-            if prev_page in previous_descriptions:
-                page_desc = previous_descriptions[prev_page]
-                context.append(f"Previous page {prev_page}: {page_desc}")
+        for prev_page, page_desc in context_window:
+            context.append(f"Previous page {prev_page}: {page_desc}")
                 
         return "\n".join(context) if context else "No previous context available."
 
-    def _build_text_consistency_rules(self, consistency_context: str) -> List[str]:
+    def _build_text_consistency_rules(self) -> List[str]:
         rules = ["Important consistency instructions:"]
         if 'character_consistency' in self.book_config:
             rules.extend(self.book_config['character_consistency'])
@@ -116,9 +178,6 @@ class PromptManager:
             rules.extend(self.book_config['style_consistency'])
         else:
             rules.append(f"- Maintain the same narrative tone throughout") # Text specific
-            
-        if consistency_context and "No previous context" not in consistency_context:
-            rules.append(f"- **Narrative Flow:** Ensure the text flows logically from previous events.") # Simplified context reference
         return rules
 
     def _build_text_instructions(self) -> List[str]:
@@ -161,19 +220,16 @@ class PromptManager:
             summary.append(f"- {char_data.get('name', 'Unknown')} ({char_data.get('description', '')})")
         return summary
 
-    def _build_scene_summary(self, scene_requirements: Optional[Dict]) -> List[str]:
-        summary = []
+    @staticmethod
+    def _write_scene_summary(w, scene_requirements: Optional[Dict]) -> None:
         if scene_requirements:
-            summary.extend([
-                "\nSetting:",
-                f"- Location: {scene_requirements.get('location', 'N/A')}",
-                f"- Description: {scene_requirements.get('description', 'N/A')}",
-                f"- Atmosphere: {scene_requirements.get('atmosphere', 'N/A')}"
-            ])
+            w(f"\n\nSetting:\n- Location: {scene_requirements.get('location', 'N/A')}")
+            w(f"\n- Description: {scene_requirements.get('description', 'N/A')}")
+            w(f"\n- Atmosphere: {scene_requirements.get('atmosphere', 'N/A')}")
             if elements := scene_requirements.get('elements'):
-                summary.append("- Elements:")
-                summary.extend([f"  * {element}" for element in elements])
-        return summary
+                w("\n- Elements:")
+                for element in elements:
+                    w(f"\n  * {element}")
 
     def _build_text_generation_guidance(self) -> List[str]:
         guidance = []
@@ -199,35 +255,22 @@ class PromptManager:
                               ) -> str:
         """Generate the final prompt string for image generation, incorporating reference image if applicable."""
         
-        # Build the core prompt parts (scene, characters, rules, style)
-        prompt_parts = self._build_core_image_prompt(page_number, story_text, scene_requirements, required_characters)
-        
-        # --- Handle Reference Image and Guidance --- #
-        reference_image_part = None
+        # --- Handle Reference Image Guidance --- #
+        # (the image itself is read and encoded once by BookGenerator, which caches it across pages)
         reference_guidance_part = None
         
         if reference_page_num:
             ref_image_path_str = original_image_files.get(reference_page_num)
             if ref_image_path_str and os.path.exists(ref_image_path_str):
                 try:
-                    # Load and encode image
-                    with open(ref_image_path_str, 'rb') as f: image_data = f.read()
-                    image_base64 = base64.b64encode(image_data).decode('utf-8')
-                    
                     # Get reference handling guidance from TransitionManager
                     reference_handling = self.transition_manager.get_reference_handling(page_number, reference_page_num)
                     
-                    # Format guidance text
-                    guidance_lines = ["REFERENCE IMAGE GUIDANCE:"]
-                    if maintain := reference_handling.get('maintain'): guidance_lines.extend([f"- Maintain: {item}" for item in maintain])
-                    if adapt := reference_handling.get('adapt'): guidance_lines.extend([f"- Adapt: {item}" for item in adapt])
-                    if ignore := reference_handling.get('ignore'): guidance_lines.extend([f"- Ignore: {item}" for item in ignore])
-                    
-                    # Create prompt parts for reference image and guidance
-                    reference_guidance_part = "\n".join(guidance_lines)
-                    reference_image_part = { # Store as dict for later processing if needed, though APIClient expects string now
-                        "inlineData": {"mimeType": "image/png", "data": image_base64}
-                    }
+                    # Format the guidance text in one join
+                    reference_guidance_part = "\n".join([
+                        "REFERENCE IMAGE GUIDANCE:",
+                        *(f"- {label}: {item}" for key, label in _REFERENCE_GUIDANCE_LABELS for item in (reference_handling.get(key) or ()))
+                    ])
                     logger.info(f"Successfully added reference image from page {reference_page_num} and guidance to prompt for page {page_number}")
                     
                 except Exception as e:
@@ -236,174 +279,145 @@ class PromptManager:
                 logger.warning(f"Reference image path for page {reference_page_num} not found or invalid.")
 
         # --- Assemble Final Prompt --- #
-        # Insert reference guidance *before* critical requirements if it exists
+        # Every section is written straight into one buffer; the reference guidance (if any)
+        # goes *before* the critical requirements
+        buf = io.StringIO()
+        w = buf.write
+        w(f"PROMPT TYPE: Children's book illustration for page {page_number}\n")
+        w(f"TEXT CONTEXT: \"{story_text}\"\n\n")
+        w("SCENE ANALYSIS:\n")
+        self._write_scene_analysis(w, required_characters, scene_requirements, story_text)
+        w("\n\n")
         if reference_guidance_part:
-            # Find the index of the critical requirements header
-            try:
-                critical_req_index = prompt_parts.index("CRITICAL REQUIREMENTS (FOLLOW THESE EXACTLY):")
-                # Insert reference guidance and a separator before it
-                prompt_parts.insert(critical_req_index, "") # Separator
-                prompt_parts.insert(critical_req_index + 1, reference_guidance_part)
-                prompt_parts.insert(critical_req_index + 2, "\n**CRITICAL CONSISTENCY NOTE:** Use text rules (marked 'ALWAYS') as primary source for appearance. Use reference image mainly for style, palette, placement. TEXT RULES OVERRIDE IMAGE CONFLICTS.")
-                prompt_parts.insert(critical_req_index + 3, "") # Separator
-            except ValueError:
-                logger.warning("Could not find 'CRITICAL REQUIREMENTS' header to insert reference guidance before.")
-                # Append at the end as a fallback
-                prompt_parts.extend(["", reference_guidance_part, "\n**CRITICAL CONSISTENCY NOTE:** Use text rules (marked 'ALWAYS') as primary source for appearance. Use reference image mainly for style, palette, placement. TEXT RULES OVERRIDE IMAGE CONFLICTS."])
-
-        # NOTE: The actual image data (reference_image_part) is NOT added to the text prompt string here.
+            w("\n")
+            w(reference_guidance_part)
+            w("\n")
+            w(_REFERENCE_CONSISTENCY_NOTE)
+            w("\n\n")
+        self._write_core_image_requirements(w, required_characters, scene_requirements)
+
+        # NOTE: The actual image data is NOT added to the text prompt string here.
         # The APIClient.generate_image method handles sending the reference_image_b64 separately.
         # This method now focuses on generating the *textual* part of the prompt, including guidance.
 
-        final_prompt_string = "\n".join(prompt_parts)
-        logger.debug(f"Final image prompt text for page {page_number}: {final_prompt_string[:500]}...")
+        final_prompt_string = buf.getvalue()
+        # Lazy: the preview slice is only copied when debug logging is actually enabled
+        logger.opt(lazy=True).debug("Final image prompt text for page {}: {}...", lambda: page_number, lambda: final_prompt_string[:500])
         
         return final_prompt_string
 
-    def _build_core_image_prompt(self, page_number: int, story_text: str, 
-                                 scene_requirements: Dict, required_characters: List[Dict]) -> List[str]:
-        """Builds the main list of prompt parts excluding reference image handling."""
-        # Get required components
-        scene_analysis = self._create_scene_analysis(required_characters, scene_requirements, story_text)
-        character_instructions = self._build_character_instructions(required_characters, scene_requirements)
-        anti_duplication_rules = self._get_anti_duplication_rules(len(required_characters), required_characters)
-        generation_steps = self._get_generation_steps()
-        art_style_guidance = self._get_art_style_guidance()
-
-        # Build the main prompt parts list
-        prompt_parts = [
-            f"PROMPT TYPE: Children's book illustration for page {page_number}",
-            f"TEXT CONTEXT: \"{story_text}\"",
-            "",
-            f"SCENE ANALYSIS:",
-            scene_analysis,
-            "",
-            "CRITICAL REQUIREMENTS (FOLLOW THESE EXACTLY):",
-            "- NO CHARACTER DUPLICATION: Each character must appear EXACTLY ONCE in the image",
-            f"- CHARACTERS:",
-            character_instructions,
-            "",
-            anti_duplication_rules,
-            "",
-            "GENERATION STEPS:",
-            generation_steps,
-            "",
-            "ART STYLE:",
-            *art_style_guidance
-        ]
-        return prompt_parts
-
-    def _create_scene_analysis(self, required_characters: List[dict], scene_requirements: dict, 
-                               content_text: str) -> str: # Removed story_actions as it was empty
-        """Create scene analysis with character and environment details."""
+    def _write_core_image_requirements(self, w, required_characters: List[dict], scene_requirements: dict) -> None:
+        """Write the critical requirements, generation steps and art style sections."""
+        w("CRITICAL REQUIREMENTS (FOLLOW THESE EXACTLY):\n")
+        w("- NO CHARACTER DUPLICATION: Each character must appear EXACTLY ONCE in the image\n")
+        w("- CHARACTERS:\n")
+        self._write_character_instructions(w, required_characters, scene_requirements)
+        w("\n\n")
+        self._write_anti_duplication_rules(w, len(required_characters), required_characters)
+        w("\n\nGENERATION STEPS:\n")
+        w(self._generation_steps_block)
+        w("\n\nART STYLE:\n")
+        w(self._art_style_block)
+
+    @staticmethod
+    def _write_scene_analysis(w, required_characters: List[dict], scene_requirements: dict, 
+                              content_text: str) -> None: # Removed story_actions as it was empty
+        """Write scene analysis with character and environment details."""
         scene_desc = scene_requirements.get('description', 'A scene')
         atmosphere = scene_requirements.get('atmosphere', 'neutral')
         elements = scene_requirements.get('elements', [])
         character_list = ', '.join([f"{c['name']} (exactly 1)" for c in required_characters])
-        elements_text = "\n".join([f"- {elem}" for elem in elements]) if elements else "No specific elements defined"
-        
-        scene_analysis_parts = [
-            f"1. Scene Description: {scene_desc}",
-            f"2. Character List: {character_list}",
-            f"3. Total Characters: {len(required_characters)}",
-            f"4. Atmosphere: {atmosphere}",
-            f"5. Key Elements:",
-            elements_text,
-            f"6. Guiding Text Context: \"{content_text}\"" # Reference the page text
-        ]
         
-        # Add visual details from scene_requirements
-        for visual_key in ['emotion', 'lighting', 'mood', 'visual_focus', 'color_palette']:
-            if value := scene_requirements.get(visual_key):
-                scene_analysis_parts.append(f"7. Visual {visual_key.replace('_', ' ').title()}: {value}")
+        w(f"1. Scene Description: {scene_desc}\n")
+        w(f"2. Character List: {character_list}\n")
+        w(f"3. Total Characters: {len(required_characters)}\n")
+        w(f"4. Atmosphere: {atmosphere}\n")
+        w("5. Key Elements:\n")
+        if elements:
+            w(f"- {elements[0]}")
+            for elem in elements[1:]:
+                w(f"\n- {elem}")
+        else:
+            w("No specific elements defined")
+        w(f"\n6. Guiding Text Context: \"{content_text}\"") # Reference the page text
+        
+        # Add visual details from scene_requirements (skipped outright when none are present)
+        if not _VISUAL_KEYS.isdisjoint(scene_requirements):
+            for visual_key, label in _VISUAL_DETAILS:
+                if value := scene_requirements.get(visual_key):
+                    w(f"\n7. Visual {label}: {value}")
                 
         if env_type := scene_requirements.get('environment_type'):
-            scene_analysis_parts.append(f"8. Environment Type: {env_type}")
+            w(f"\n8. Environment Type: {env_type}")
             if characteristics := scene_requirements.get('environment_characteristics'):
-                 scene_analysis_parts.append(f"9. Environment Characteristics: {', '.join(characteristics)}")
-                
-        return "\n".join(scene_analysis_parts)
+                 w(f"\n9. Environment Characteristics: {', '.join(characteristics)}")
 
-    def _build_character_instructions(self, required_characters: List[dict], scene_requirements: dict) -> str:
-        """Build detailed instructions for each character, including appearance rules."""
-        instructions = [] # Start empty, will join later
-        char_names = set()
+    @staticmethod
+    def _write_character_instructions(w, required_characters: List[dict], scene_requirements: dict) -> None:
+        """Write detailed instructions for each character, including appearance rules."""
+        # SceneManager hands out a cast that is unique by name, so no duplicate check here
         all_char_rules = scene_requirements.get('character_appearance_rules', {})
 
-        for i, char in enumerate(required_characters):
+        for i, char in enumerate(required_characters, 1):
+            # Read each field of the character once
             char_name = char.get('name')
-            if not char_name or char_name in char_names:
-                continue
-            char_names.add(char_name)
+            description = char.get('description', 'N/A')
+            action = char.get('action')
+            emotion = char.get('emotion')
+            char_rules = all_char_rules.get(char_name)
+            
+            if i > 1:
+                w("\n\n") # Blank line between characters
 
-            char_details = [
-                f"{i+1}. Character: {char_name} | Description: {char.get('description', 'N/A')}"
-            ]
+            w(f"{i}. Character: {char_name} | Description: {description}")
             
-            char_rules = all_char_rules.get(char_name, {})
             if char_rules:
-                char_details.append("   | APPEARANCE RULES (MUST FOLLOW):")
+                w("\n   | APPEARANCE RULES (MUST FOLLOW):")
                 for rule_type, rule_value in char_rules.items():
-                    rule_text = f"     - {rule_type.capitalize()}: {(', '.join(rule_value) if isinstance(rule_value, list) else rule_value)}"
-                    char_details.append(rule_text)
+                    w(f"\n     - {rule_type.capitalize()}: {(', '.join(rule_value) if isinstance(rule_value, list) else rule_value)}")
             else:
                  # Fallback to standard appearance attributes from character definition
-                 appearance_rules_added = False
-                 for attr in ['appearance', 'outfit', 'features']:
-                     if value := char.get(attr):
-                         if not appearance_rules_added:
-                              char_details.append("   | MANDATORY APPEARANCE RULES:")
-                              appearance_rules_added = True
-                         char_details.append(f"     - {attr.capitalize()} (ALWAYS): {value}")
-
-            if action := char.get('action'):
-                char_details.append(f"   | Action: {action}")
-            if emotion := char.get('emotion'):
-                char_details.append(f"   | Emotion: {emotion}")
+                 appearance_rules = [(label, value) for attr, label in _APPEARANCE_ATTRS if (value := char.get(attr))]
+                 if appearance_rules:
+                      w("\n   | MANDATORY APPEARANCE RULES:")
+                 for label, value in appearance_rules:
+                      w(f"\n     - {label} (ALWAYS): {value}")
+
+            if action:
+                w(f"\n   | Action: {action}")
+            if emotion:
+                w(f"\n   | Emotion: {emotion}")
             else:
-                 char_details.append(f"   | Emotion: None specified")
-                 
-            instructions.append("\n".join(char_details))
-            
-        return "\n\n".join(instructions)
-
-    def _get_anti_duplication_rules(self, num_characters: int, required_characters: Optional[List[dict]] = None) -> str:
-        """Get anti-duplication rules from generation config."""
-        # Use self.generation_config
-        rules_config = self.generation_config.get('anti_duplication_rules', {})
-        rules = rules_config.get('rules', [])
-        consistency = rules_config.get('consistency_rules', [])
-        flexibility = rules_config.get('flexibility_rules', [])
-        verification = rules_config.get('verification_rules', [])
-        
-        characters_text = []
+                 w(f"\n   | Emotion: None specified")
+
+    @staticmethod
+    def _format_rule_section(heading: str, rules: List[str]) -> str:
+        """Format a heading and its rules as a bulleted block, or '' when there are no rules."""
+        return "\n".join([heading, *(f"- {rule}" for rule in rules)]) if rules else ""
+
+    def _antidup_count_blocks(self, num_characters: int) -> Tuple[str, str]:
+        """Core and verification rule blocks, which only vary with the character count."""
+        return (
+            self._format_rule_section("\nCORE RULES:", [rule.format(num_characters=num_characters) for rule in self._antidup_rule_templates]),
+            self._format_rule_section("\nFINAL VERIFICATION (BEFORE RENDERING):", [rule.format(num_characters=num_characters) for rule in self._antidup_verification_templates]),
+        )
+
+    def _write_anti_duplication_rules(self, w, num_characters: int, required_characters: Optional[List[dict]] = None) -> None:
+        """Write anti-duplication rules from generation config."""
+        core_block, verification_block = self._antidup_count_blocks(num_characters)
+        
+        w("ANTI-DUPLICATION INSTRUCTIONS (EXTREMELY IMPORTANT):")
+        if core_block:
+            w("\n")
+            w(core_block)
         if required_characters:
-            characters_text = [
-                f"- {char.get('name', '?')}: {char.get('description', '')} - MUST APPEAR EXACTLY ONCE"
-                for char in required_characters
-            ]
-        
-        formatted_rules = ["ANTI-DUPLICATION INSTRUCTIONS (EXTREMELY IMPORTANT):"]
-        if rules:
-             formatted_rules.append("\nCORE RULES:")
-             formatted_rules.extend([f"- {rule.format(num_characters=num_characters)}" for rule in rules])
-        if characters_text:
-            formatted_rules.append("\nCHARACTER COUNT REQUIREMENTS:")
-            formatted_rules.extend(characters_text)
-        if consistency:
-            formatted_rules.append("\nCONSISTENCY REQUIREMENTS:")
-            formatted_rules.extend([f"- {rule}" for rule in consistency])
-        if flexibility:
-            formatted_rules.append("\nALLOWED VARIATIONS:")
-            formatted_rules.extend([f"- {rule}" for rule in flexibility])
-        if verification:
-            formatted_rules.append("\nFINAL VERIFICATION (BEFORE RENDERING):")
-            formatted_rules.extend([f"- {rule.format(num_characters=num_characters)}" for rule in verification])
-        
-        formatted_rules.append("\nWARNING: DUPLICATING CHARACTERS IS THE MOST COMMON ERROR.")
-        formatted_rules.append("CAREFULLY CHECK YOUR SCENE AND REMOVE ANY DUPLICATE CHARACTERS.")
-        
-        return "\n".join(formatted_rules)
+            w("\n\nCHARACTER COUNT REQUIREMENTS:")
+            for char in required_characters:
+                w(f"\n- {char.get('name', '?')}: {char.get('description', '')} - MUST APPEAR EXACTLY ONCE")
+        for block in (self._antidup_consistency_block, self._antidup_flexibility_block, verification_block, _ANTIDUP_WARNING):
+            if block:
+                w("\n")
+                w(block)
 
     def _get_generation_steps(self) -> str:
         """Get generation steps from generation config."""
@@ -473,7 +487,7 @@ class PromptManager:
         else:
             for char_name in characters_list:
                 # Find the character info by name
-                char_info = next((info for info in self.characters_config.values() if info.get('name') == char_name), None)
+                char_info = self._character_by_name.get(char_name)
                 if char_info:
                     details.append(f"{char_name} ({char_info.get('appearance', '')}, {char_info.get('outfit', '')})")
                 else:
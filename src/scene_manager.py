@@ -1,3 +1,4 @@
+import bisect
 from pathlib import Path
 from loguru import logger
 import yaml
@@ -35,8 +36,38 @@ class SceneManager:
         # Initialize caches
         self.scene_cache = {}
         self.character_cache = {}
+        self.requirements_cache = {}
         self.existing_characters = set()  # Initialize the set to track existing characters
         
+        # Per-character fields used by get_required_characters, pulled out of the config once
+        # (identity fields, intro page, actions by phase, emotions by page, appearance extras)
+        self._character_specs = tuple(
+            ({'name': char_info['name'], 'type': char_type, 'description': char_info.get('description', '')},
+             char_info.get('introduction', {}).get('page', 1),
+             char_info.get('actions', {}), char_info.get('emotional_states', {}),
+             {attr: char_info[attr] for attr in ('appearance', 'outfit', 'features') if attr in char_info})
+            for char_type, char_info in self.characters.items()
+        )
+        # Distinct introduction pages (sorted) and, for each, the specs introduced by then in
+        # config order, so a page only walks the characters that have already been introduced
+        self._intro_pages = sorted({spec[1] for spec in self._character_specs})
+        self._specs_introduced_by = [
+            tuple(spec for spec in self._character_specs if spec[1] <= intro_page)
+            for intro_page in self._intro_pages
+        ]
+        
+        # Character name -> config entry (the first entry wins if two share a name), for lookups by name
+        self._character_by_name = {}
+        for char_info in self.characters.values():
+            self._character_by_name.setdefault(char_info['name'], char_info)
+        
+        # Character name -> introduction page, for reference lookups
+        self._intro_page_by_name = {
+            cd.get('name'): intro_page
+            for cd in self.characters.values()
+            if (intro_page := cd.get('introduction', {}).get('page'))
+        }
+        
     def detect_new_characters(self, page_number: int, text: str) -> list:
         """Detect new characters mentioned in the text."""
         new_characters = []
@@ -76,31 +107,41 @@ class SceneManager:
 
     def get_character_appearance_rules(self, character_name: str) -> dict:
         """Get character appearance rules from config."""
-        for char_type, char_data in self.characters.items():
-            if char_data['name'] == character_name:
-                appearance_rules = {}
-                # Get appearance and features from character config
-                if 'appearance' in char_data:
-                    appearance_rules['appearance'] = char_data['appearance']
-                if 'outfit' in char_data:
-                    appearance_rules['outfit'] = char_data['outfit']
-                if 'features' in char_data:
-                    appearance_rules['features'] = char_data['features']
-                return appearance_rules
-        return {}
+        char_data = self._character_by_name.get(character_name)
+        if char_data is None:
+            return {}
+        appearance_rules = {}
+        # Get appearance and features from character config
+        if 'appearance' in char_data:
+            appearance_rules['appearance'] = char_data['appearance']
+        if 'outfit' in char_data:
+            appearance_rules['outfit'] = char_data['outfit']
+        if 'features' in char_data:
+            appearance_rules['features'] = char_data['features']
+        return appearance_rules
 
     def get_character_action(self, character_name: str, page_number: int, text: str = None) -> str:
         """Get character action based on story progression."""
         story_phase = self._get_story_phase(page_number)
         
-        for char_type, char_info in self.characters.items():
-            if char_info['name'] == character_name:
-                if story_phase in char_info.get('actions', {}):
-                    return char_info['actions'][story_phase]
+        char_info = self._character_by_name.get(character_name)
+        if char_info is not None and story_phase in char_info.get('actions', {}):
+            return char_info['actions'][story_phase]
         return ""
 
     def get_scene_requirements(self, page_number: int, content_text: str = None) -> dict:
         """Get scene requirements for a specific page."""
+        # Like the characters, the requirements only depend on the page (they are asked for
+        # both when prompting for the text and when preparing the image), so cache per page
+        if page_number not in self.requirements_cache:
+            self.requirements_cache[page_number] = self._build_scene_requirements(page_number, content_text)
+        scene_info = dict(self.requirements_cache[page_number])
+        if 'characters' in scene_info:
+            scene_info['characters'] = [dict(character) for character in scene_info['characters']]
+        return scene_info
+
+    def _build_scene_requirements(self, page_number: int, content_text: str = None) -> dict:
+        """Assemble a page's scene, characters, transition, emotion and environment requirements."""
         # Get base scene info
         scene_info = self._get_base_scene_info(page_number)
         if not scene_info:
@@ -185,34 +226,37 @@ class SceneManager:
     def get_required_characters(self, page_number: int, content_text: str) -> List[dict]:
         """Get required characters for the current page with full details."""
         # (Note: content_text is currently unused in this logic but kept for potential future use)
-        required_characters = []
+        # The result therefore only depends on the page, so it is cached per page
+        if page_number not in self.character_cache:
+            self.character_cache[page_number] = self._build_required_characters(page_number)
+        return [dict(character) for character in self.character_cache[page_number]]
+
+    def _build_required_characters(self, page_number: int) -> List[dict]:
+        """Work out which characters appear on a page from their actions and emotional states."""
+        required_characters = {}
         story_phase = self._get_story_phase(page_number) # Use internal method
+        page_key = str(page_number)
         
-        for char_type, char_info in self.characters.items():
-            intro_page = char_info.get('introduction', {}).get('page', 1)
-            if page_number < intro_page: continue
-                
-            has_action = char_info.get('actions', {}).get(story_phase) is not None
-            has_emotion = str(page_number) in char_info.get('emotional_states', {})
+        cutoff = bisect.bisect_right(self._intro_pages, page_number)
+        introduced_specs = self._specs_introduced_by[cutoff - 1] if cutoff else ()
+        
+        for identity, _, actions, emotional_states, appearance in introduced_specs:
+            char_action = actions.get(story_phase)
+            has_action = char_action is not None
+            has_emotion = page_key in emotional_states
             
             if has_action or has_emotion:
-                char_action = char_info.get('actions', {}).get(story_phase)
-                char_emotion = char_info.get('emotional_states', {}).get(str(page_number))
+                char_emotion = emotional_states.get(page_key)
                 
                 include_reason = []
                 if has_action: include_reason.append(f"action for '{story_phase}'")
                 if has_emotion: include_reason.append(f"emotion for page {page_number}")
-                logger.debug(f"Including '{char_info['name']}' for page {page_number}: {', '.join(include_reason)}")
+                logger.debug(f"Including '{identity['name']}' for page {page_number}: {', '.join(include_reason)}")
 
-                appearance = {attr: char_info[attr] for attr in ['appearance', 'outfit', 'features'] if attr in char_info}
-                
-                character = {
-                    'name': char_info['name'], 'type': char_type, 
-                    'description': char_info.get('description', ''),
-                    'action': char_action, 'emotion': char_emotion, **appearance
-                }
-                required_characters.append(character)
+                # Keyed on name so the cast is unique by construction (the first entry for a name wins)
+                required_characters.setdefault(identity['name'], {**identity, 'action': char_action, 'emotion': char_emotion, **appearance})
         
+        required_characters = list(required_characters.values())
         char_names = [char['name'] for char in required_characters]
         logger.info(f"Required characters for page {page_number}: {', '.join(char_names) if char_names else 'None'}")
         return required_characters
@@ -387,7 +431,7 @@ CHARACTER EMOTIONAL STATES:
         # Return default phase if nothing else matches
         return self.story_progression.get('default_phase', 'conclusion')
 
-    def find_reference_page(self, current_page_number: int, available_original_files: Dict[int, str]) -> Optional[int]:
+    def find_reference_page(self, current_page_number: int, available_original_files: Dict[int, str], scene_reqs: Optional[dict] = None) -> Optional[int]:
         """Find the most suitable reference image page for consistency.
         
         Checks for character introduction pages first, then falls back to the most recent page.
@@ -397,42 +441,35 @@ CHARACTER EMOTIONAL STATES:
             current_page_number: The page number for which a reference is needed.
             available_original_files: A dictionary mapping page numbers to their saved original image file paths.
                                        This comes from BookGenerator's state.
+            scene_reqs: Scene requirements already computed for the current page, if the caller has them.
                                        
         Returns:
             The page number of the best reference image, or None if none found.
         """
-        # Filter available files to only include pages before the current one
-        valid_reference_pages = {p: path for p, path in available_original_files.items() if p < current_page_number}
+        # The most recent preceding page with an image (one pass, no need to sort them all)
+        most_recent_page = max((p for p in available_original_files if p < current_page_number), default=None)
         
-        if not valid_reference_pages:
+        if most_recent_page is None:
             logger.info(f"No preceding pages with images found to use as reference for page {current_page_number}")
             return None
-
-        # Sort available pages by number, descending (most recent first)
-        sorted_available_pages = sorted(valid_reference_pages.keys(), reverse=True)
         
         try:
             # Get scene requirements to determine characters present on the current page
             # Pass None for content_text as we only need character info here
-            scene_reqs = self.get_scene_requirements(current_page_number, None) 
+            if scene_reqs is None:
+                scene_reqs = self.get_scene_requirements(current_page_number, None)
             
             # Extract just the names of characters required for the current page
             # Handle the case where scene_reqs['characters'] might be None or empty
             current_char_details = scene_reqs.get('characters', [])
             current_chars_names = [char['name'] for char in current_char_details] if current_char_details else []
             
-            intro_pages_with_images = []
-            if current_chars_names:
-                logger.debug(f"Checking intro pages for current characters: {current_chars_names}")
-                for char_name in current_chars_names:
-                    # Find the character type (key in self.characters dict) based on name
-                    char_type = next((ct for ct, cd in self.characters.items() if cd.get('name') == char_name), None)
-                    if char_type:
-                        intro_page = self.characters[char_type].get('introduction', {}).get('page')
-                        # Check if the intro page exists, is not the current page, and has an image file saved
-                        if intro_page and intro_page != current_page_number and intro_page in valid_reference_pages:
-                            intro_pages_with_images.append(intro_page)
-                            logger.debug(f"Found potential reference: Intro page {intro_page} for character '{char_name}'")
+            # Introduction pages (before this one, with a saved image) of the characters on this page
+            intro_pages_with_images = [
+                intro_page for name in current_chars_names
+                if (intro_page := self._intro_page_by_name.get(name))
+                and intro_page < current_page_number and intro_page in available_original_files
+            ]
 
             # If any relevant character intro pages with images were found, use the earliest one
             if intro_pages_with_images:
@@ -445,12 +482,5 @@ CHARACTER EMOTIONAL STATES:
              logger.warning(f"Could not determine character introduction page for reference due to error: {e}. Falling back to most recent.")
 
         # Fallback: If no intro pages found or error occurred, use the most recent available page
-        if sorted_available_pages:
-            most_recent_page = sorted_available_pages[0]
-            logger.info(f"Using most recent page {most_recent_page} as reference for page {current_page_number} (fallback)")
-            return most_recent_page
-            
-        # Should theoretically not be reached if valid_reference_pages was not empty initially,
-        # but added for completeness.
-        logger.info(f"Could not find any suitable reference page for page {current_page_number}")
-        return None
\ No newline at end of file
+        logger.info(f"Using most recent page {most_recent_page} as reference for page {current_page_number} (fallback)")
+        return most_recent_page
\ No newline at end of file
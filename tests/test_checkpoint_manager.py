@@ -0,0 +1,68 @@
+from src.checkpoint_manager import CheckpointManager, PageSet
+
+
+def test_resumed_run_changes_survive_reload(tmp_path):
+    """Changes made on a resumed run reach disk even when the generator touched the shared objects first."""
+    checkpoint_file = tmp_path / "checkpoint.msgpack"
+
+    first = CheckpointManager(str(checkpoint_file))
+    first.set_output_dir(tmp_path / "book")
+    first.add_completed_page(1)
+    first.add_page_description(1, "Page one")
+    first.flush()
+
+    # Resume the way BookGenerator does: keep the objects _load_checkpoint hands back
+    resumed = CheckpointManager(str(checkpoint_file))
+    data = resumed._load_checkpoint()
+    completed_pages = data['completed_pages']
+    previous_descriptions = data['previous_descriptions']
+    pages_with_images = data['pages_with_images']
+    original_image_files = data['original_image_files']
+
+    # The generator updates its own references before calling the setters
+    completed_pages.add(2)
+    resumed.add_completed_page(2)
+    previous_descriptions[2] = "Page two"
+    resumed.add_page_description(2, "Page two")
+    pages_with_images.add(2)
+    resumed.add_page_with_image(2)
+    image_path = str(tmp_path / "book" / "page_02" / "image_original_1.png")
+    original_image_files[2] = image_path
+    resumed.add_original_image_file(2, image_path)
+    resumed.flush()
+
+    reloaded = CheckpointManager(str(checkpoint_file))._load_checkpoint()
+    assert reloaded['completed_pages'] == PageSet([1, 2])
+    assert reloaded['previous_descriptions'] == {1: "Page one", 2: "Page two"}
+    assert reloaded['pages_with_images'] == PageSet([2])
+    assert reloaded['original_image_files'] == {2: image_path}
+
+
+def test_close_writes_pending_changes_and_stops_the_writer(tmp_path, monkeypatch):
+    """close() leaves nothing behind for exit: the writer thread is gone and the path stays absolute."""
+    monkeypatch.chdir(tmp_path)
+    checkpoint = CheckpointManager("checkpoint.msgpack")
+    checkpoint.add_completed_page(3)
+    checkpoint.close()
+
+    assert checkpoint.checkpoint_file == tmp_path.resolve() / "checkpoint.msgpack"
+    assert not checkpoint._writer.is_alive()
+    assert CheckpointManager(str(tmp_path / "checkpoint.msgpack"))._load_checkpoint()['completed_pages'] == PageSet([3])
+
+
+def test_clear_checkpoint_discards_queued_and_pending_changes(tmp_path):
+    """Records queued or still pending when the checkpoint is cleared never reach a later reload."""
+    checkpoint_file = tmp_path / "checkpoint.msgpack"
+    checkpoint = CheckpointManager(str(checkpoint_file))
+    checkpoint.add_completed_page(1)
+    checkpoint.flush()
+    checkpoint.add_completed_page(2)  # Still pending when the clear runs
+    checkpoint.clear_checkpoint()
+
+    assert not checkpoint_file.exists()
+    assert not checkpoint.journal_file.exists()
+    assert checkpoint.completed_pages == PageSet()
+
+    checkpoint.add_completed_page(5)
+    checkpoint.close()
+    assert CheckpointManager(str(checkpoint_file))._load_checkpoint()['completed_pages'] == PageSet([5])
@@ -0,0 +1,142 @@
+import base64
+import shutil
+import sys
+from io import BytesIO
+from pathlib import Path
+
+import pytest
+import yaml
+from PIL import Image
+
+import src.generate_book as generate_book
+from src.api_client import RateLimitError
+from src.checkpoint_manager import CheckpointManager
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+def _png_b64() -> str:
+    buffer = BytesIO()
+    Image.new('RGB', (256, 256), 'green').save(buffer, 'PNG')
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+class FakeAPIClient:
+    """Stands in for APIClient; the image call for one page hits rate limits a given number of times."""
+
+    def __init__(self, limited_page: int, rate_limited_calls: int):
+        self.limited_page = limited_page
+        self.rate_limited_calls = rate_limited_calls
+        self.image = _png_b64()
+
+    def generate_story_text(self, prompt, conversation_history=None, page_number=None, temperature=None):
+        return f"Story text for page {page_number}.", True
+
+    def generate_backup_story(self, prompt, temperature=0.7):
+        return "Backup story text.", True
+
+    def generate_image(self, prompt_text, safety_settings=None, reference_image_b64=None, page_number=None, scene_requirements=None):
+        if page_number == self.limited_page and self.rate_limited_calls:
+            self.rate_limited_calls -= 1
+            raise RateLimitError("API request failed with status code 429: rate limit exceeded", retry_after=3.0)
+        return [self.image]
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def book_dir(tmp_path, monkeypatch):
+    """A working directory with a two-page config.yaml and the bundled fonts."""
+    config = yaml.safe_load((REPO_ROOT / "config.yaml").read_text(encoding='utf-8'))
+    config['book']['page_count'] = 2
+    config['generation']['concurrency'] = 1
+    (tmp_path / "config.yaml").write_text(yaml.safe_dump(config), encoding='utf-8')
+    shutil.copytree(REPO_ROOT / "assets" / "fonts", tmp_path / "assets" / "fonts")
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def test_rate_limit_retry_resumes_the_same_generator(book_dir, monkeypatch):
+    """A page given up on after its per-call retries makes the whole-book retry run a second attempt."""
+    # The image for page 2 is rate limited through all six tries of its first attempt
+    api_clients = []
+    def make_api_client(config):
+        api_clients.append(FakeAPIClient(limited_page=2, rate_limited_calls=6))
+        return api_clients[-1]
+    monkeypatch.setattr(generate_book, 'APIClient', make_api_client)
+    monkeypatch.setattr(generate_book.time, 'sleep', lambda seconds: None)
+    monkeypatch.setattr(generate_book.BookGenerator, '_create_final_book', lambda self: None)
+    monkeypatch.setattr(generate_book.TextOverlayManager, 'apply_text_overlay', lambda self, *args, **kwargs: None)
+
+    attempts = []
+    original_generate_book = generate_book.BookGenerator.generate_book
+    def counting_generate_book(self):
+        attempts.append(self)
+        return original_generate_book(self)
+    monkeypatch.setattr(generate_book.BookGenerator, 'generate_book', counting_generate_book)
+
+    generate_book.handle_rate_limit_retry(max_retries=3, initial_wait=1)
+
+    assert len(attempts) == 2
+    assert attempts[0] is attempts[1]
+    assert len(api_clients) == 1
+    generator = attempts[0]
+    assert not generator.failed_pages
+    assert set(generator.completed_pages) == {1, 2}
+
+    checkpoint = CheckpointManager(str(book_dir / "book_generation_checkpoint.msgpack"))._load_checkpoint()
+    assert checkpoint['is_complete']
+    assert set(checkpoint['completed_pages']) == {1, 2}
+
+
+def test_rate_limit_retry_honors_retry_after_and_caps_the_wait(book_dir, monkeypatch):
+    """Retry-After replaces the computed wait; otherwise the jittered wait never exceeds the cap."""
+    monkeypatch.setattr(generate_book, 'APIClient', lambda config: FakeAPIClient(limited_page=None, rate_limited_calls=0))
+    sleeps = []
+    monkeypatch.setattr(generate_book.time, 'sleep', sleeps.append)
+
+    errors = [
+        RateLimitError("rate limit exceeded", retry_after=7.0),
+        RateLimitError("rate limit exceeded"),
+        RateLimitError("rate limit exceeded"),
+    ]
+    def generate_book_until_quota_recovers(self):
+        if errors:
+            raise errors.pop(0)
+    monkeypatch.setattr(generate_book.BookGenerator, 'generate_book', generate_book_until_quota_recovers)
+
+    generate_book.handle_rate_limit_retry(max_retries=5, initial_wait=400)
+
+    assert not errors
+    assert len(sleeps) == 3
+    assert sleeps[0] == 7.0
+    # Without the cap the third wait would be drawn from [800, 1600]
+    cap = generate_book._MAX_RETRY_WAIT
+    assert all(cap / 2 <= wait <= cap for wait in sleeps[1:])
+
+
+def test_main_retry_resumes_the_run_it_started(book_dir, monkeypatch):
+    """main --retry runs one checkpoint on one output dir, and it stays complete after every exit flush."""
+    checkpoint_managers = []
+    def make_checkpoint_manager():
+        checkpoint_managers.append(CheckpointManager(str(book_dir / "book_generation_checkpoint.msgpack")))
+        return checkpoint_managers[-1]
+    monkeypatch.setattr(generate_book, 'CheckpointManager', make_checkpoint_manager)
+    monkeypatch.setattr(generate_book, 'APIClient', lambda config: FakeAPIClient(limited_page=2, rate_limited_calls=6))
+    monkeypatch.setattr(generate_book.time, 'sleep', lambda seconds: None)
+    monkeypatch.setattr(generate_book.BookGenerator, '_create_final_book', lambda self: None)
+    monkeypatch.setattr(generate_book.TextOverlayManager, 'apply_text_overlay', lambda self, *args, **kwargs: None)
+    monkeypatch.setattr(sys, 'argv', ['generate_book', '--retry'])
+
+    generate_book.main()
+    # What the exit hooks would still write
+    for checkpoint_manager in checkpoint_managers:
+        checkpoint_manager.flush()
+
+    output_dirs = list((book_dir / "outputs").iterdir())
+    assert len(output_dirs) == 1
+    checkpoint = CheckpointManager(str(book_dir / "book_generation_checkpoint.msgpack"))._load_checkpoint()
+    assert checkpoint['is_complete']
+    assert Path(checkpoint['output_dir']).resolve() == output_dirs[0].resolve()
+    assert set(checkpoint['completed_pages']) == {1, 2}